@@ -1,5 +1,7 @@
 """Complete agent definitions with LangGraph/LangChain guidance and support for DuckDuckGo search."""
 
+import functools
+
 # Define agent names
 SCHEDULER_AGENT = "SCHEDULER_AGENT"
 REPORTING_AGENT = "REPORTING_AGENT"
@@ -9,6 +11,7 @@ TARIFF_RISK_AGENT = "TARIFF_RISK_AGENT"
 LOGISTICS_RISK_AGENT = "LOGISTICS_RISK_AGENT"
 
 
+@functools.lru_cache(maxsize=None)
 def get_scheduler_agent_instructions():
     """Returns scheduler agent instructions - comprehensive analysis with proper risk agent routing."""
     return """
@@ -98,6 +101,7 @@ IMPORTANT: This is just a template. You must fill in the actual data values.
 """
 
 
+@functools.lru_cache(maxsize=None)
 def get_political_risk_agent_instructions():
     """Returns political risk agent instructions with DuckDuckGo Search handling."""
     return """
@@ -156,6 +160,7 @@ After generating the response, call the convert_to_json tool to parse and store
 """
 
 
+@functools.lru_cache(maxsize=None)
 def get_tariff_risk_agent_instructions():
     """Returns tariff risk agent instructions with DuckDuckGo Search handling."""
     return """
@@ -193,6 +198,7 @@ RULES:
 """
 
 
+@functools.lru_cache(maxsize=None)
 def get_logistics_risk_agent_instructions():
     """Returns logistics risk agent instructions with DuckDuckGo Search handling."""
     return """
@@ -228,6 +234,7 @@ RULES:
 """
 
 
+@functools.lru_cache(maxsize=None)
 def get_reporting_agent_instructions():
     """Updated reporting agent instructions to produce cleaner output."""
     return """
@@ -278,6 +285,7 @@ Report ID: [report_id]
 """
 
 
+@functools.lru_cache(maxsize=None)
 def get_assistant_agent_instructions():
     """Returns assistant agent instructions."""
     return """
@@ -1,6 +1,7 @@
 """FastAPI server for the equipment schedule agent."""
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import asyncio
@@ -9,7 +10,6 @@ import dotenv
 import uuid
 from typing import Optional, Dict, List
 from datetime import datetime
-import json
 
 # Load environment variables
 dotenv.load_dotenv()
@@ -18,7 +18,10 @@ from managers.chatbot_manager import ChatbotManager
 from utils.database_utils import get_connection, execute_rpc_with_retry
 
 
-app = FastAPI(title="Equipment Schedule Agent API")
+app = FastAPI(
+    title="Equipment Schedule Agent API",
+    default_response_class=ORJSONResponse,
+)
 
 # Add CORS middleware so the frontend can call this API
 app.add_middleware(
@@ -170,9 +173,10 @@ async def get_sessions():
         client = get_connection()
 
         # Get all sessions with their events
-        response = client.table('dim_agent_event_log').select(
+        query = client.table('dim_agent_event_log').select(
             'session_id, conversation_id, event_time, user_query, agent_output, action'
-        ).order('created_date', desc=True).execute()
+        ).order('created_date', desc=True)
+        response = await asyncio.to_thread(query.execute)
 
         if not response.data:
             return []
@@ -180,26 +184,22 @@ async def get_sessions():
         # Group by session_id, then by conversation_id
         sessions = {}
         for row in response.data:
-            sid = row.get('session_id')
-            cid = row.get('conversation_id')
-            if sid not in sessions:
-                sessions[sid] = {}
-            if cid not in sessions[sid]:
-                sessions[sid][cid] = {
-                    'conversation_id': cid,
-                    'last_interaction': row.get('event_time'),
-                    'messages': []
-                }
-            sessions[sid][cid]['messages'].append({
-                'event_time': row.get('event_time'),
-                'user_query': row.get('user_query'),
-                'agent_output': row.get('agent_output'),
-                'action': row.get('action')
+            g = row.get
+            sid, cid, evt = g('session_id'), g('conversation_id'), g('event_time')
+            cur = sessions.setdefault(sid, {}).setdefault(cid, {
+                'conversation_id': cid,
+                'last_interaction': evt,
+                'messages': []
+            })
+            cur['messages'].append({
+                'event_time': evt,
+                'user_query': g('user_query'),
+                'agent_output': g('agent_output'),
+                'action': g('action')
             })
             # Track max event_time
-            evt = row.get('event_time')
-            if evt and evt > (sessions[sid][cid].get('last_interaction') or ''):
-                sessions[sid][cid]['last_interaction'] = evt
+            if evt and evt > (cur['last_interaction'] or ''):
+                cur['last_interaction'] = evt
 
         results = []
         for sid, convs in sessions.items():
@@ -221,45 +221,18 @@ async def get_sessions():
 @app.get("/api/session-ids", response_model=List[SessionIdResponse])
 async def get_session_ids():
     try:
-        client = get_connection()
-
-        # Get sessions with their first user query
-        response = client.table('dim_agent_event_log').select(
-            'session_id, user_query, event_time'
-        ).not_.is_('user_query', 'null').order('event_time', desc=False).execute()
-
-        if not response.data:
-            return []
-
-        # Group by session_id and get first query + earliest date
-        session_map = {}
-        for row in response.data:
-            sid = row.get('session_id')
-            if sid not in session_map:
-                session_map[sid] = {
-                    'first_query': row.get('user_query', ''),
-                    'session_date': row.get('event_time', ''),
-                    'order_date': row.get('event_time', '')
-                }
-
-        # Sort by date descending
-        sorted_sessions = sorted(
-            session_map.items(),
-            key=lambda x: x[1]['order_date'] or '',
-            reverse=True
-        )
+        # First user query and earliest date per session, newest session first
+        data = await asyncio.to_thread(execute_rpc_with_retry, 'get_session_ids_with_first_query')
 
-        results = [
+        return [
             SessionIdResponse(
-                session_id=sid,
-                user_query=data['first_query'] or '',
-                session_date=data['session_date'] or '',
+                session_id=row['session_id'],
+                user_query=row['user_query'] or '',
+                session_date=row['session_date'] or '',
             )
-            for sid, data in sorted_sessions
+            for row in data or []
         ]
 
-        return results
-
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error retrieving session IDs: {str(e)}"
@@ -271,9 +244,10 @@ async def get_thinking_logs():
     try:
         client = get_connection()
 
-        response = client.table('dim_agent_thinking_log').select('*').order(
+        query = client.table('dim_agent_thinking_log').select('*').order(
             'created_date', desc=True
-        ).limit(500).execute()
+        ).limit(500)
+        response = await asyncio.to_thread(query.execute)
 
         if not response.data:
             return []
@@ -281,33 +255,28 @@ async def get_thinking_logs():
         # Group by session_id, then conversation_id, then agent
         sessions = {}
         for row in response.data:
-            sid = row.get('session_id')
-            cid = row.get('conversation_id')
-            agent = row.get('agent_name')
-
-            if sid not in sessions:
-                sessions[sid] = {}
-            if cid not in sessions[sid]:
-                sessions[sid][cid] = {
-                    'conversation_id': cid,
-                    'user_query': row.get('user_query'),
-                    'agents': {}
-                }
-            if agent not in sessions[sid][cid]['agents']:
-                sessions[sid][cid]['agents'][agent] = {
-                    'agent_name': agent,
-                    'first_appearance': row.get('created_date'),
-                    'thoughts': []
-                }
-            sessions[sid][cid]['agents'][agent]['thoughts'].append({
-                'thought_content': row.get('thought_content'),
-                'thinking_stage': row.get('thinking_stage'),
-                'thinking_stage_output': row.get('thinking_stage_output'),
-                'created_date': row.get('created_date')
+            g = row.get
+            sid, cid, agent = g('session_id'), g('conversation_id'), g('agent_name')
+            query, created = g('user_query'), g('created_date')
+
+            conv = sessions.setdefault(sid, {}).setdefault(cid, {
+                'conversation_id': cid,
+                'user_query': query,
+                'agents': {}
+            })
+            conv['agents'].setdefault(agent, {
+                'agent_name': agent,
+                'first_appearance': created,
+                'thoughts': []
+            })['thoughts'].append({
+                'thought_content': g('thought_content'),
+                'thinking_stage': g('thinking_stage'),
+                'thinking_stage_output': g('thinking_stage_output'),
+                'created_date': created
             })
             # Update user_query if this row has one
-            if row.get('user_query') and not sessions[sid][cid].get('user_query'):
-                sessions[sid][cid]['user_query'] = row.get('user_query')
+            if query and not conv['user_query']:
+                conv['user_query'] = query
 
         results = []
         for sid, convs in sessions.items():
@@ -335,9 +304,10 @@ async def get_thinking_log_ids():
     try:
         client = get_connection()
 
-        response = client.table('dim_agent_thinking_log').select(
+        query = client.table('dim_agent_thinking_log').select(
             'session_id, user_query, created_date'
-        ).not_.is_('user_query', 'null').order('created_date', desc=True).execute()
+        ).not_.is_('user_query', 'null').order('created_date', desc=True)
+        response = await asyncio.to_thread(query.execute)
 
         if not response.data:
             return []
@@ -345,9 +315,7 @@ async def get_thinking_log_ids():
         # Get unique session_ids with their first query
         session_map = {}
         for row in response.data:
-            sid = row.get('session_id')
-            if sid not in session_map:
-                session_map[sid] = row.get('user_query')
+            session_map.setdefault(row.get('session_id'), row.get('user_query'))
 
         results = [
             ThinkingLogIdResponse(
@@ -371,9 +339,10 @@ async def get_thinking_log_by_session(session_id: str):
     try:
         client = get_connection()
 
-        response = client.table('dim_agent_thinking_log').select('*').eq(
+        query = client.table('dim_agent_thinking_log').select('*').eq(
             'session_id', session_id
-        ).order('created_date', desc=False).execute()
+        ).order('created_date', desc=False)
+        response = await asyncio.to_thread(query.execute)
 
         if not response.data:
             return ThinkingLogResponse(session_id=session_id, conversations=[])
@@ -381,29 +350,27 @@ async def get_thinking_log_by_session(session_id: str):
         # Group by conversation_id, then agent
         convs = {}
         for row in response.data:
-            cid = row.get('conversation_id')
-            agent = row.get('agent_name')
+            g = row.get
+            cid, agent = g('conversation_id'), g('agent_name')
+            query, created = g('user_query'), g('created_date')
 
-            if cid not in convs:
-                convs[cid] = {
-                    'conversation_id': cid,
-                    'user_query': row.get('user_query'),
-                    'agents': {}
-                }
-            if agent not in convs[cid]['agents']:
-                convs[cid]['agents'][agent] = {
-                    'agent_name': agent,
-                    'first_appearance': row.get('created_date'),
-                    'thoughts': []
-                }
-            convs[cid]['agents'][agent]['thoughts'].append({
-                'thought_content': row.get('thought_content'),
-                'thinking_stage': row.get('thinking_stage'),
-                'thinking_stage_output': row.get('thinking_stage_output'),
-                'created_date': row.get('created_date')
+            conv = convs.setdefault(cid, {
+                'conversation_id': cid,
+                'user_query': query,
+                'agents': {}
+            })
+            conv['agents'].setdefault(agent, {
+                'agent_name': agent,
+                'first_appearance': created,
+                'thoughts': []
+            })['thoughts'].append({
+                'thought_content': g('thought_content'),
+                'thinking_stage': g('thinking_stage'),
+                'thinking_stage_output': g('thinking_stage_output'),
+                'created_date': created
             })
-            if row.get('user_query') and not convs[cid].get('user_query'):
-                convs[cid]['user_query'] = row.get('user_query')
+            if query and not conv['user_query']:
+                conv['user_query'] = query
 
         conversations = []
         for cid, conv_data in convs.items():
@@ -428,9 +395,10 @@ async def get_session_by_id(session_id: str):
     try:
         client = get_connection()
 
-        response = client.table('dim_agent_event_log').select(
+        query = client.table('dim_agent_event_log').select(
             'session_id, conversation_id, event_time, user_query, agent_output, agent_name, action'
-        ).eq('session_id', session_id).order('event_time', desc=False).execute()
+        ).eq('session_id', session_id).order('event_time', desc=False)
+        response = await asyncio.to_thread(query.execute)
 
         if not response.data:
             raise HTTPException(
@@ -440,23 +408,22 @@ async def get_session_by_id(session_id: str):
         # Group by conversation_id
         convs = {}
         for row in response.data:
-            cid = row.get('conversation_id')
-            if cid not in convs:
-                convs[cid] = {
-                    'conversation_id': cid,
-                    'last_interaction': row.get('event_time'),
-                    'messages': []
-                }
-            convs[cid]['messages'].append({
-                'event_time': row.get('event_time'),
-                'user_query': row.get('user_query'),
-                'agent_output': row.get('agent_output'),
-                'agent_name': row.get('agent_name'),
-                'action': row.get('action')
+            g = row.get
+            cid, evt = g('conversation_id'), g('event_time')
+            cur = convs.setdefault(cid, {
+                'conversation_id': cid,
+                'last_interaction': evt,
+                'messages': []
+            })
+            cur['messages'].append({
+                'event_time': evt,
+                'user_query': g('user_query'),
+                'agent_output': g('agent_output'),
+                'agent_name': g('agent_name'),
+                'action': g('action')
             })
-            evt = row.get('event_time')
-            if evt and evt > (convs[cid].get('last_interaction') or ''):
-                convs[cid]['last_interaction'] = evt
+            if evt and evt > (cur['last_interaction'] or ''):
+                cur['last_interaction'] = evt
 
         return SessionResponse(
             session_id=session_id,
@@ -475,7 +442,8 @@ async def get_session_by_id(session_id: str):
 async def get_heatmap_data(conversation_id: str, session_id: str):
     try:
         # Call the PostgreSQL function via Supabase RPC
-        data = execute_rpc_with_retry(
+        data = await asyncio.to_thread(
+            execute_rpc_with_retry,
             'get_country_risk_heatmap_data',
             {'p_conversation_id': conversation_id, 'p_session_id': session_id}
         )
@@ -490,7 +458,8 @@ async def get_heatmap_data(conversation_id: str, session_id: str):
                 session_id=session_id,
                 country=row.get('country', ''),
                 average_risk=str(round(float(row.get('average_risk', 0)))),
-                breakdown=json.dumps(row.get('breakdown', '')) if isinstance(row.get('breakdown'), (dict, list)) else str(row.get('breakdown', '')),
+                # The SQL function already returns the breakdown as JSON text
+                breakdown=row.get('breakdown', ''),
             )
             for row in data
         ]
@@ -508,9 +477,10 @@ async def get_reports():
     try:
         client = get_connection()
 
-        response = client.table('fact_risk_report').select(
+        query = client.table('fact_risk_report').select(
             'session_id, blob_url, filename, report_type, created_date'
-        ).order('created_date', desc=True).execute()
+        ).order('created_date', desc=True)
+        response = await asyncio.to_thread(query.execute)
 
         if not response.data:
             return []
@@ -1,25 +1,125 @@
 """FastAPI server for the equipment schedule agent."""
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import asyncio
 import os
+import time
 import dotenv
 import uuid
-from typing import Optional, Dict, List
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional, List
 from datetime import datetime
-import json
+import orjson
 
 # Load environment variables
 dotenv.load_dotenv()
 
 from managers.chatbot_manager import ChatbotManager
 from utils.database_utils import get_connection, execute_rpc_with_retry
+from plugins.logging_plugin import start_log_flusher, flush_logs
 
 
-app = FastAPI(title="Equipment Schedule Agent API")
+class ChatbotManagerCache:
+    """LRU cache of per-session ChatbotManagers that also expires idle sessions."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # session_id -> (last_used, manager)
+        self._cleanup_tasks = set()  # strong references so running cleanups aren't garbage-collected
+
+    def __contains__(self, session_id: str) -> bool:
+        self._expire()
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_create(self, session_id: str) -> ChatbotManager:
+        """Return the session's manager, creating it if needed, and mark it as used."""
+        self._expire()
+        entry = self._entries.pop(session_id, None)
+        manager = entry[1] if entry else ChatbotManager()
+        self._entries[session_id] = (time.monotonic(), manager)
+
+        while len(self._entries) > self.maxsize:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._cleanup(evicted)
+
+        return manager
+
+    def discard(self, session_id: str):
+        """Drop a session's manager if present."""
+        entry = self._entries.pop(session_id, None)
+        if entry:
+            self._cleanup(entry[1])
+
+    async def clear(self):
+        """Clean up and drop every manager."""
+        while self._entries:
+            _, (_, manager) = self._entries.popitem(last=False)
+            await manager.cleanup_sessions(max_age_minutes=0)
+        # Let cleanups started by evictions finish before shutdown
+        if self._cleanup_tasks:
+            await asyncio.gather(*self._cleanup_tasks, return_exceptions=True)
+
+    def _expire(self):
+        # Entries are kept in last-used order, so expired ones are at the front
+        cutoff = time.monotonic() - self.ttl
+        while self._entries:
+            session_id, (last_used, manager) = next(iter(self._entries.items()))
+            if last_used >= cutoff:
+                break
+            del self._entries[session_id]
+            self._cleanup(manager)
+
+    def _cleanup(self, manager: ChatbotManager):
+        try:
+            task = asyncio.get_running_loop().create_task(manager.cleanup_sessions(max_age_minutes=0))
+        except RuntimeError:
+            asyncio.run(manager.cleanup_sessions(max_age_minutes=0))
+            return
+        self._cleanup_tasks.add(task)
+        task.add_done_callback(self._cleanup_done)
+
+    def _cleanup_done(self, task: asyncio.Task):
+        self._cleanup_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error cleaning up chatbot manager: {task.exception()}")
+
+
+# Store active chatbot managers, bounded in count and idle time
+active_managers = ChatbotManagerCache(
+    maxsize=int(os.getenv("MANAGER_CACHE_MAXSIZE", "2048")),
+    ttl=float(os.getenv("MANAGER_CACHE_TTL_SECONDS", "1800")),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the shared Supabase client up front so no request pays for it
+    try:
+        await asyncio.to_thread(get_connection)
+    except Exception as e:
+        print(f"Supabase client not ready at startup: {e}")
+    # Log rows are queued by the agents and written in bulk by this flusher
+    start_log_flusher()
+    yield
+    # Cleanup resources when shutting down
+    await active_managers.clear()
+    # Write whatever the agents logged during the last turns
+    await asyncio.to_thread(flush_logs)
+
+
+app = FastAPI(
+    title="Equipment Schedule Agent API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 # Add CORS middleware so the frontend can call this API
 app.add_middleware(
@@ -30,10 +130,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store active chatbot managers
-active_managers: Dict[str, ChatbotManager] = {}
-
-
 class ChatRequest(BaseModel):
     session_id: Optional[str] = None
     message: str
@@ -87,33 +183,26 @@ class ReportResponse(BaseModel):
 
 def get_chatbot_manager(session_id: str) -> ChatbotManager:
     """Get or create a ChatbotManager for the session."""
-    if session_id not in active_managers:
-        active_managers[session_id] = ChatbotManager()
-
-    return active_managers[session_id]
+    return active_managers.get_or_create(session_id)
 
 
 def validate_session(session_id: str) -> bool:
     """Validate if a session exists and is still active."""
-    if not session_id:
-        return False
+    return bool(session_id) and session_id in active_managers
 
-    # Check if session exists in active managers
-    if session_id not in active_managers:
-        return False
 
-    return True
+def resolve_session_id(session_id: Optional[str]) -> str:
+    """Return session_id if it is still active, otherwise a new session ID."""
+    if validate_session(session_id):
+        return session_id
+    # Missing, expired or invalid session, start a new one
+    return str(uuid.uuid4())
 
 
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     try:
-        session_id = request.session_id or str(uuid.uuid4())
-
-        # Validate existing session
-        if request.session_id and not validate_session(session_id):
-            # Session expired or invalid, create new session
-            session_id = str(uuid.uuid4())
+        session_id = resolve_session_id(request.session_id)
 
         # Get or create chatbot manager
         chatbot_manager = get_chatbot_manager(session_id)
@@ -139,8 +228,7 @@ async def chat_endpoint(request: ChatRequest):
 
         except asyncio.TimeoutError:
             # Clean up the timed-out session
-            if session_id in active_managers:
-                del active_managers[session_id]
+            active_managers.discard(session_id)
 
             raise HTTPException(
                 status_code=504,
@@ -149,70 +237,46 @@ async def chat_endpoint(request: ChatRequest):
 
     except Exception as e:
         # Clean up the session on error
-        if session_id in active_managers:
-            del active_managers[session_id]
+        active_managers.discard(session_id)
 
         raise HTTPException(
             status_code=500, detail=f"Error processing chat request: {str(e)}"
         )
 
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup resources when shutting down."""
-    for manager in active_managers.values():
-        if hasattr(manager, "cleanup_sessions"):
-            await manager.cleanup_sessions(max_age_minutes=0)
-    active_managers.clear()
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream the chat response as newline-delimited JSON events."""
+    session_id = resolve_session_id(request.session_id)
 
+    chatbot_manager = get_chatbot_manager(session_id)
 
-@app.get("/api/sessions", response_model=List[SessionResponse])
-async def get_sessions():
-    try:
-        client = get_connection()
+    async def event_stream():
+        async for event in chatbot_manager.stream_message(
+            session_id, request.message, user_email=request.user_email
+        ):
+            event["session_id"] = session_id
+            yield orjson.dumps(event) + b"\n"
 
-        # Get all sessions with their events
-        response = client.table('dim_agent_event_log').select(
-            'session_id, conversation_id, event_time, user_query, agent_output, action'
-        ).order('created_date', desc=True).execute()
-
-        if not response.data:
-            return []
-
-        # Group by session_id, then by conversation_id
-        sessions = {}
-        for row in response.data:
-            sid = row.get('session_id')
-            cid = row.get('conversation_id')
-            if sid not in sessions:
-                sessions[sid] = {}
-            if cid not in sessions[sid]:
-                sessions[sid][cid] = {
-                    'conversation_id': cid,
-                    'last_interaction': row.get('event_time'),
-                    'messages': []
-                }
-            sessions[sid][cid]['messages'].append({
-                'event_time': row.get('event_time'),
-                'user_query': row.get('user_query'),
-                'agent_output': row.get('agent_output'),
-                'action': row.get('action')
-            })
-            # Track max event_time
-            evt = row.get('event_time')
-            if evt and evt > (sessions[sid][cid].get('last_interaction') or ''):
-                sessions[sid][cid]['last_interaction'] = evt
-
-        results = []
-        for sid, convs in sessions.items():
-            results.append(
-                SessionResponse(
-                    session_id=sid,
-                    conversations=list(convs.values())
-                )
-            )
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+@app.get("/api/sessions", responses={200: {"model": List[SessionResponse]}})
+async def get_sessions(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    since: Optional[datetime] = None,
+):
+    try:
+        # Grouped by session_id, then conversation_id, in the database;
+        # limit/offset page through sessions, newest first
+        data = await asyncio.to_thread(execute_rpc_with_retry, 'get_sessions_grouped', {
+            'p_limit': limit,
+            'p_offset': offset,
+            'p_since': since.isoformat() if since else None,
+        })
 
-        return results
+        return ORJSONResponse(data or [])
 
     except Exception as e:
         raise HTTPException(
@@ -220,47 +284,13 @@ async def get_sessions():
         )
 
 
-@app.get("/api/session-ids", response_model=List[SessionIdResponse])
+@app.get("/api/session-ids", responses={200: {"model": List[SessionIdResponse]}})
 async def get_session_ids():
     try:
-        client = get_connection()
+        # First user query and earliest date per session, newest session first
+        data = await asyncio.to_thread(execute_rpc_with_retry, 'get_session_ids_with_first_query')
 
-        # Get sessions with their first user query
-        response = client.table('dim_agent_event_log').select(
-            'session_id, user_query, event_time'
-        ).not_.is_('user_query', 'null').order('event_time', desc=False).execute()
-
-        if not response.data:
-            return []
-
-        # Group by session_id and get first query + earliest date
-        session_map = {}
-        for row in response.data:
-            sid = row.get('session_id')
-            if sid not in session_map:
-                session_map[sid] = {
-                    'first_query': row.get('user_query', ''),
-                    'session_date': row.get('event_time', ''),
-                    'order_date': row.get('event_time', '')
-                }
-
-        # Sort by date descending
-        sorted_sessions = sorted(
-            session_map.items(),
-            key=lambda x: x[1]['order_date'] or '',
-            reverse=True
-        )
-
-        results = [
-            SessionIdResponse(
-                session_id=sid,
-                user_query=data['first_query'] or '',
-                session_date=data['session_date'] or '',
-            )
-            for sid, data in sorted_sessions
-        ]
-
-        return results
+        return ORJSONResponse(data or [])
 
     except Exception as e:
         raise HTTPException(
@@ -268,65 +298,25 @@ async def get_session_ids():
         )
 
 
-@app.get("/api/thinking-logs", response_model=List[ThinkingLogResponse])
-async def get_thinking_logs():
+@app.get("/api/thinking-logs", responses={200: {"model": List[ThinkingLogResponse]}})
+async def get_thinking_logs(
+    limit: int = Query(500, ge=1, le=5000),
+    offset: int = Query(0, ge=0),
+    since: Optional[datetime] = None,
+):
     try:
-        client = get_connection()
-
-        response = client.table('dim_agent_thinking_log').select('*').not_.is_(
-            'session_id', 'null'
-        ).order(
-            'created_date', desc=True
-        ).limit(500).execute()
-
-        if not response.data:
-            return []
-
-        # Group by session_id, then conversation_id, then agent
-        sessions = {}
-        for row in response.data:
-            sid = row.get('session_id')
-            cid = row.get('conversation_id')
-            agent = row.get('agent_name')
-
-            if sid not in sessions:
-                sessions[sid] = {}
-            if cid not in sessions[sid]:
-                sessions[sid][cid] = {
-                    'conversation_id': cid,
-                    'user_query': row.get('user_query'),
-                    'agents': {}
-                }
-            if agent not in sessions[sid][cid]['agents']:
-                sessions[sid][cid]['agents'][agent] = {
-                    'agent_name': agent,
-                    'first_appearance': row.get('created_date'),
-                    'thoughts': []
-                }
-            sessions[sid][cid]['agents'][agent]['thoughts'].append({
-                'thought_content': row.get('thought_content'),
-                'thinking_stage': row.get('thinking_stage'),
-                'thinking_stage_output': row.get('thinking_stage_output'),
-                'created_date': row.get('created_date')
-            })
-            # Update user_query if this row has one
-            if row.get('user_query') and not sessions[sid][cid].get('user_query'):
-                sessions[sid][cid]['user_query'] = row.get('user_query')
-
-        results = []
-        for sid, convs in sessions.items():
-            conversations = []
-            for cid, conv_data in convs.items():
-                conversations.append({
-                    'conversation_id': cid,
-                    'user_query': conv_data.get('user_query'),
-                    'agents': list(conv_data['agents'].values())
-                })
-            results.append(
-                ThinkingLogResponse(session_id=sid, conversations=conversations)
-            )
-
-        return results
+        # Grouped by session_id, then conversation_id, then agent in the database.
+        # Thought text is omitted here; fetch it per session via
+        # /api/thinking-logs-by-session-id/{session_id}
+        data = await asyncio.to_thread(execute_rpc_with_retry, 'get_thinking_logs_grouped', {
+            'row_limit': limit,
+            'row_offset': offset,
+            'p_since': since.isoformat() if since else None,
+        })
+
+        # Not streamed: the RPC groups a whole row page at once, and its row
+        # offsets cut across sessions, so there is nothing to send incrementally
+        return ORJSONResponse(data or [])
 
     except Exception as e:
         raise HTTPException(
@@ -334,33 +324,12 @@ async def get_thinking_logs():
         )
 
 
-@app.get("/api/thinking-log-ids", response_model=List[ThinkingLogIdResponse])
+@app.get("/api/thinking-log-ids", responses={200: {"model": List[ThinkingLogIdResponse]}})
 async def get_thinking_log_ids():
     try:
-        client = get_connection()
+        data = await asyncio.to_thread(execute_rpc_with_retry, 'get_thinking_log_ids')
 
-        response = client.table('dim_agent_thinking_log').select(
-            'session_id, user_query, created_date'
-        ).not_.is_('user_query', 'null').not_.is_('session_id', 'null').order('created_date', desc=True).execute()
-
-        if not response.data:
-            return []
-
-        # Get unique session_ids with their first query
-        session_map = {}
-        for row in response.data:
-            sid = row.get('session_id')
-            if sid not in session_map:
-                session_map[sid] = row.get('user_query')
-
-        results = [
-            ThinkingLogIdResponse(
-                session_id=sid, first_query=first_query
-            )
-            for sid, first_query in session_map.items()
-        ]
-
-        return results
+        return ORJSONResponse(data or [])
 
     except Exception as e:
         raise HTTPException(
@@ -373,51 +342,11 @@ async def get_thinking_log_ids():
 )
 async def get_thinking_log_by_session(session_id: str):
     try:
-        client = get_connection()
+        conversations = await asyncio.to_thread(
+            execute_rpc_with_retry, 'get_thinking_log_by_session', {'p_session_id': session_id}
+        )
 
-        response = client.table('dim_agent_thinking_log').select('*').eq(
-            'session_id', session_id
-        ).order('created_date', desc=False).execute()
-
-        if not response.data:
-            return ThinkingLogResponse(session_id=session_id, conversations=[])
-
-        # Group by conversation_id, then agent
-        convs = {}
-        for row in response.data:
-            cid = row.get('conversation_id')
-            agent = row.get('agent_name')
-
-            if cid not in convs:
-                convs[cid] = {
-                    'conversation_id': cid,
-                    'user_query': row.get('user_query'),
-                    'agents': {}
-                }
-            if agent not in convs[cid]['agents']:
-                convs[cid]['agents'][agent] = {
-                    'agent_name': agent,
-                    'first_appearance': row.get('created_date'),
-                    'thoughts': []
-                }
-            convs[cid]['agents'][agent]['thoughts'].append({
-                'thought_content': row.get('thought_content'),
-                'thinking_stage': row.get('thinking_stage'),
-                'thinking_stage_output': row.get('thinking_stage_output'),
-                'created_date': row.get('created_date')
-            })
-            if row.get('user_query') and not convs[cid].get('user_query'):
-                convs[cid]['user_query'] = row.get('user_query')
-
-        conversations = []
-        for cid, conv_data in convs.items():
-            conversations.append({
-                'conversation_id': cid,
-                'user_query': conv_data.get('user_query'),
-                'agents': list(conv_data['agents'].values())
-            })
-
-        return ThinkingLogResponse(session_id=session_id, conversations=conversations)
+        return ThinkingLogResponse(session_id=session_id, conversations=conversations or [])
 
     except HTTPException:
         raise
@@ -430,42 +359,16 @@ async def get_thinking_log_by_session(session_id: str):
 @app.get("/api/sessions/{session_id}", response_model=SessionResponse)
 async def get_session_by_id(session_id: str):
     try:
-        client = get_connection()
-
-        response = client.table('dim_agent_event_log').select(
-            'session_id, conversation_id, event_time, user_query, agent_output, agent_name, action'
-        ).eq('session_id', session_id).order('event_time', desc=False).execute()
+        conversations = await asyncio.to_thread(
+            execute_rpc_with_retry, 'get_session_by_id', {'p_session_id': session_id}
+        )
 
-        if not response.data:
+        if not conversations:
             raise HTTPException(
                 status_code=404, detail=f"Session not found with ID: {session_id}"
             )
 
-        # Group by conversation_id
-        convs = {}
-        for row in response.data:
-            cid = row.get('conversation_id')
-            if cid not in convs:
-                convs[cid] = {
-                    'conversation_id': cid,
-                    'last_interaction': row.get('event_time'),
-                    'messages': []
-                }
-            convs[cid]['messages'].append({
-                'event_time': row.get('event_time'),
-                'user_query': row.get('user_query'),
-                'agent_output': row.get('agent_output'),
-                'agent_name': row.get('agent_name'),
-                'action': row.get('action')
-            })
-            evt = row.get('event_time')
-            if evt and evt > (convs[cid].get('last_interaction') or ''):
-                convs[cid]['last_interaction'] = evt
-
-        return SessionResponse(
-            session_id=session_id,
-            conversations=list(convs.values())
-        )
+        return SessionResponse(session_id=session_id, conversations=conversations)
 
     except HTTPException:
         raise
@@ -475,31 +378,22 @@ async def get_session_by_id(session_id: str):
         )
 
 
-@app.get("/api/heatmap", response_model=List[HeatmapResponse])
+@app.get(
+    "/api/heatmap",
+    response_class=ORJSONResponse,
+    responses={200: {"model": List[HeatmapResponse]}},
+)
 async def get_heatmap_data(conversation_id: str, session_id: str):
     try:
-        # Call the PostgreSQL function via Supabase RPC
-        data = execute_rpc_with_retry(
-            'get_country_risk_heatmap_data',
+        # The RPC returns rows already shaped like HeatmapResponse, so they
+        # are serialized as-is instead of being validated one by one
+        data = await asyncio.to_thread(
+            execute_rpc_with_retry,
+            'get_country_risk_heatmap_json',
             {'p_conversation_id': conversation_id, 'p_session_id': session_id}
         )
 
-        if not data:
-            return []
-
-        results = [
-            HeatmapResponse(
-                datetime_stamp=datetime.now().isoformat(),
-                conversation_id=conversation_id,
-                session_id=session_id,
-                country=row.get('country', ''),
-                average_risk=str(round(float(row.get('average_risk', 0)))),
-                breakdown=json.dumps(row.get('breakdown', '')) if isinstance(row.get('breakdown'), (dict, list)) else str(row.get('breakdown', '')),
-            )
-            for row in data
-        ]
-
-        return results
+        return ORJSONResponse(data or [])
 
     except Exception as e:
         raise HTTPException(
@@ -507,30 +401,30 @@ async def get_heatmap_data(conversation_id: str, session_id: str):
         )
 
 
-@app.get("/api/reports", response_model=List[ReportResponse])
+@app.get("/api/reports", responses={200: {"model": List[ReportResponse]}})
 async def get_reports():
     try:
         client = get_connection()
 
-        response = client.table('fact_risk_report').select(
+        query = client.table('fact_risk_report').select(
             'session_id, blob_url, filename, report_type, created_date'
-        ).order('created_date', desc=True).execute()
-
-        if not response.data:
-            return []
+        ).order('created_date', desc=True)
+        # supabase-py is synchronous; keep the HTTP round-trip off the event loop
+        response = await asyncio.to_thread(query.execute)
 
+        # Rows go out as plain dicts; the fields already match ReportResponse
         results = [
-            ReportResponse(
-                session_id=row.get('session_id', ''),
-                blob_url=row.get('blob_url', ''),
-                filename=row.get('filename', ''),
-                report_type=row.get('report_type', ''),
-                created_date=str(row.get('created_date', '')),
-            )
-            for row in response.data
+            {
+                'session_id': g('session_id', ''),
+                'blob_url': g('blob_url', ''),
+                'filename': g('filename', ''),
+                'report_type': g('report_type', ''),
+                'created_date': str(g('created_date', '')),
+            }
+            for g in (row.get for row in response.data or [])
         ]
 
-        return results
+        return ORJSONResponse(results)
 
     except Exception as e:
         raise HTTPException(
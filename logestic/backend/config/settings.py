@@ -1,10 +1,15 @@
 """Configuration settings for the application."""
 
 import os
+import functools
 from supabase import create_client, Client
 
+@functools.lru_cache(maxsize=1)
 def get_supabase_client() -> Client:
-    """Gets the Supabase client connection.
+    """Gets the shared Supabase client connection.
+    
+    Environment variables are read and the client is created on the first
+    call only; later calls return the same client and its connection pool.
     
     Returns:
         Client: The Supabase client connection
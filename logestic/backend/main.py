@@ -11,11 +11,25 @@ from managers.scheduler import WorkflowScheduler
 # Load environment variables
 load_dotenv()
 
+def install_uvloop():
+    """Use uvloop for asyncio when it is available (not supported on Windows)."""
+    if sys.platform == "win32":
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    uvloop.install()
+    return True
+
 def main():
     """Main function."""
     # Set up logging
     logging.basicConfig(level=logging.INFO)
     
+    # Must happen before any asyncio.run / uvicorn loop is created
+    install_uvloop()
+    
     # Parse command line arguments
     if len(sys.argv) > 1:
         if sys.argv[1] == "--workflow-only":
@@ -4,86 +4,231 @@ import uuid
 import asyncio
 import json
 import logging
+import re
 from typing import Dict, Any, List, TypedDict, Annotated, Sequence, Literal
 from datetime import datetime
 import operator
+import functools
+from collections import OrderedDict
 
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_groq import ChatGroq
-from langchain_community.tools import DuckDuckGoSearchResults
 from langgraph.graph import StateGraph, END, START
-from langgraph.prebuilt import create_react_agent
+from langgraph.graph.message import add_messages
+from langgraph.prebuilt import create_react_agent, ToolNode
 
 import os
 
-from plugins.schedule_plugin import get_schedule_comparison_data
-from plugins.risk_plugin import calculate_risk_percentage, categorize_risk
-from plugins.logging_plugin import log_agent_thinking, log_agent_event, log_agent_response
-from plugins.report_file_plugin import save_report_to_file
-from plugins.political_risk_json_plugin import convert_to_json, store_political_json_output_agent_event, extract_citations
+from plugins.logging_plugin import log_agent_thinking, log_agent_event, log_agent_response, log_in_background, start_log_flusher, flush_logs
 
 from agents.agent_definitions import (
-    SCHEDULER_AGENT, get_scheduler_agent_instructions,
-    REPORTING_AGENT, get_reporting_agent_instructions,
-    ASSISTANT_AGENT, get_assistant_agent_instructions,
-    POLITICAL_RISK_AGENT, get_political_risk_agent_instructions,
-    TARIFF_RISK_AGENT, get_tariff_risk_agent_instructions,
-    LOGISTICS_RISK_AGENT, get_logistics_risk_agent_instructions
+    SCHEDULER_AGENT, SCHEDULER_AGENT_INSTRUCTIONS,
+    REPORTING_AGENT, REPORTING_AGENT_INSTRUCTIONS,
+    ASSISTANT_AGENT, ASSISTANT_AGENT_INSTRUCTIONS,
+    POLITICAL_RISK_AGENT, POLITICAL_RISK_AGENT_INSTRUCTIONS,
+    TARIFF_RISK_AGENT, TARIFF_RISK_AGENT_INSTRUCTIONS,
+    LOGISTICS_RISK_AGENT, LOGISTICS_RISK_AGENT_INSTRUCTIONS
 )
 
-def add_messages(left: list, right: list):
-    """Message reducer func."""
-    return left + right
-
 class AgentState(TypedDict):
     """The state of the multi-agent graph."""
     messages: Annotated[Sequence[BaseMessage], add_messages]
     session_id: str
     conversation_id: str
-    next_node: str
     user_email: str
+    original_query: str
+    risk_outputs_count: int
+
+# Bounds on in-memory chat history kept per manager
+MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1024"))
+MAX_TURNS = int(os.getenv("CHAT_MAX_TURNS", "10"))
+
+# Bounds on the prior-turn history handed to each agent
+AGENT_HISTORY_MESSAGES = int(os.getenv("AGENT_HISTORY_MESSAGES", "4"))
+AGENT_HISTORY_MAX_CHARS = int(os.getenv("AGENT_HISTORY_MAX_CHARS", "8000"))
+
+# System prompts wrapped once at import and shared by every agent graph
+_AGENT_PROMPTS = {
+    SCHEDULER_AGENT: SystemMessage(content=SCHEDULER_AGENT_INSTRUCTIONS),
+    POLITICAL_RISK_AGENT: SystemMessage(content=POLITICAL_RISK_AGENT_INSTRUCTIONS),
+    TARIFF_RISK_AGENT: SystemMessage(content=TARIFF_RISK_AGENT_INSTRUCTIONS),
+    LOGISTICS_RISK_AGENT: SystemMessage(content=LOGISTICS_RISK_AGENT_INSTRUCTIONS),
+    REPORTING_AGENT: SystemMessage(content=REPORTING_AGENT_INSTRUCTIONS),
+    ASSISTANT_AGENT: SystemMessage(content=ASSISTANT_AGENT_INSTRUCTIONS),
+}
+
+def _trim_history(messages: Sequence[BaseMessage], keep_last: int = AGENT_HISTORY_MESSAGES,
+                  max_chars: int = AGENT_HISTORY_MAX_CHARS) -> List[BaseMessage]:
+    """Trim the messages sent to an agent.
+    
+    The current turn (the latest HumanMessage and everything after it) is kept
+    intact since downstream agents need the full upstream output. Earlier turns
+    are cut to the last keep_last messages, each truncated to max_chars. The
+    latest scheduler reply is always kept in full, because the router sends
+    follow-up risk questions straight to the risk agents when one exists.
+    """
+    messages = list(messages)
+    turn_start = next(
+        (i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)), 0
+    )
+    schedule_index = _last_schedule_index(messages[:turn_start])
+    window_start = max(0, turn_start - keep_last)
+    history = []
+    if schedule_index is not None and schedule_index < window_start:
+        history.append(messages[schedule_index])
+    for i in range(window_start, turn_start):
+        msg = messages[i]
+        if i != schedule_index and isinstance(msg.content, str) and len(msg.content) > max_chars:
+            msg = msg.model_copy(update={"content": msg.content[:max_chars] + "... [TRUNCATED]"})
+        history.append(msg)
+    return history + messages[turn_start:]
+
+def _last_schedule_index(messages: Sequence[BaseMessage]):
+    """Return the index of the latest scheduler reply in messages, or None."""
+    return next(
+        (i for i in range(len(messages) - 1, -1, -1)
+         if isinstance(messages[i], AIMessage) and messages[i].additional_kwargs.get("agent") == SCHEDULER_AGENT),
+        None
+    )
+
+def _agent_message(agent_name: str, content: str) -> AIMessage:
+    """Wrap an agent's output in an AIMessage tagged with the producing agent."""
+    return AIMessage(content=content, name=agent_name, additional_kwargs={"agent": agent_name})
+
+def _label_agent_messages(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """Prefix tagged agent outputs with 'AGENT_NAME > ' for the model.
+    
+    ChatGroq does not send AIMessage.name, so without the label the reporting
+    agent would get the risk fan-out as several unattributed assistant messages.
+    Only the copies handed to the model are labelled; stored history and API
+    responses keep the plain content.
+    """
+    labelled = []
+    for msg in messages:
+        agent_name = msg.additional_kwargs.get("agent") if isinstance(msg, AIMessage) else None
+        if agent_name and isinstance(msg.content, str):
+            msg = msg.model_copy(update={"content": f"{agent_name} > {msg.content}"})
+        labelled.append(msg)
+    return labelled
+
+# Keyword -> node routing tables, in priority order (first listed wins)
+_ROUTER_KEYWORDS = [
+    (POLITICAL_RISK_AGENT, ["political"]),
+    (TARIFF_RISK_AGENT, ["tariff"]),
+    (LOGISTICS_RISK_AGENT, ["logistics", "shipping"]),
+    (SCHEDULER_AGENT, [
+        "schedule", "risk", "shipment", "delivery", "deliveries",
+        "equipment", "project", "order", "delay", "variance",
+        "due date", "status", "track", "all my", "show me",
+        "view all", "list all", "report", "generate"
+    ]),
+]
+
+_SCHEDULER_FOLLOWUP_KEYWORDS = [
+    (POLITICAL_RISK_AGENT, ["political"]),
+    (TARIFF_RISK_AGENT, ["tariff"]),
+    (LOGISTICS_RISK_AGENT, ["logistic", "shipping"]),
+    (REPORTING_AGENT, ["report"]),
+]
+
+def _compile_routes(keyword_table):
+    """Compile a routing table into one regex plus keyword -> node and node -> priority maps."""
+    route_map = {kw: node for node, keywords in keyword_table for kw in keywords}
+    priority = {node: i for i, (node, _) in enumerate(keyword_table)}
+    # Longest keywords first so overlapping alternatives match the full keyword
+    alternatives = sorted(route_map, key=len, reverse=True)
+    pattern = re.compile("|".join(re.escape(kw) for kw in alternatives), re.IGNORECASE)
+    return pattern, route_map, priority
+
+_ROUTER_PATTERN, _ROUTER_MAP, _ROUTER_PRIORITY = _compile_routes(_ROUTER_KEYWORDS)
+_FOLLOWUP_PATTERN, _FOLLOWUP_MAP, _ = _compile_routes(_SCHEDULER_FOLLOWUP_KEYWORDS)
+
+def _match_routes(text: str, pattern, route_map) -> set:
+    """Return the set of nodes whose keywords appear in text, in a single regex pass."""
+    return {route_map[kw.lower()] for kw in pattern.findall(text)}
+
+@functools.lru_cache(maxsize=1)
+def _build_llm():
+    """Create the shared ChatGroq client; failures raise and are not cached."""
+    from langchain_groq import ChatGroq
+    model_name = os.getenv("GROQ_MODEL", "llama3-70b-8192")
+    return ChatGroq(
+        model=model_name,
+        temperature=0,
+    )
+
+def _get_llm():
+    """Return the shared ChatGroq client, or None if it cannot be created right now."""
+    try:
+        return _build_llm()
+    except Exception as e:
+        print(f"Error initializing ChatGroq: {e}")
+        return None
+
+@functools.lru_cache(maxsize=1)
+def _get_search_tool():
+    """Return the shared DuckDuckGo search tool."""
+    from plugins.search_plugin import CachedDuckDuckGoSearchResults
+    return CachedDuckDuckGoSearchResults()
+
+@functools.lru_cache(maxsize=1)
+def _get_agent_tools() -> Dict[str, list]:
+    """Import the tool plugins on first use and return the tool list for each agent."""
+    from plugins.schedule_plugin import get_schedule_comparison_data
+    from plugins.risk_plugin import calculate_risk_percentage, categorize_risk
+    from plugins.report_file_plugin import save_report_to_file
+    from plugins.political_risk_json_plugin import convert_to_json, store_political_json_output_agent_event, extract_citations
+    
+    search_tool = _get_search_tool()
+    return {
+        SCHEDULER_AGENT: [get_schedule_comparison_data, calculate_risk_percentage, categorize_risk, log_agent_thinking],
+        POLITICAL_RISK_AGENT: [search_tool, convert_to_json, store_political_json_output_agent_event, extract_citations, log_agent_thinking],
+        TARIFF_RISK_AGENT: [search_tool, log_agent_thinking],
+        LOGISTICS_RISK_AGENT: [search_tool, log_agent_thinking],
+        REPORTING_AGENT: [save_report_to_file, log_agent_thinking],
+        ASSISTANT_AGENT: [get_schedule_comparison_data, log_agent_thinking],
+    }
 
 class ChatbotManager:
     def __init__(self):
-        try:
-            model_name = os.getenv("GROQ_MODEL", "llama3-70b-8192")
-            self.llm = ChatGroq(
-                model=model_name,
-                temperature=0,
-            )
-        except Exception as e:
-            print(f"Error initializing ChatGroq: {e}")
-            self.llm = None
-            
-        self.search_tool = DuckDuckGoSearchResults()
-        
-        # Tools for each agent
-        self.scheduler_tools = [get_schedule_comparison_data, calculate_risk_percentage, categorize_risk, log_agent_thinking]
-        self.political_tools = [self.search_tool, convert_to_json, store_political_json_output_agent_event, extract_citations, log_agent_thinking]
-        self.tariff_tools = [self.search_tool, log_agent_thinking]
-        self.logistics_tools = [self.search_tool, log_agent_thinking]
-        self.reporting_tools = [save_report_to_file, log_agent_thinking]
-        self.assistant_tools = [get_schedule_comparison_data, log_agent_thinking]
-        
-        self.graph = self._build_graph()
-        self.sessions = {}
+        # The LLM, tool plugins and graph are created on first use
+        self._llm = None
+        self._graph = None
+        start_log_flusher()
+        self.sessions = OrderedDict()
+    
+    @property
+    def llm(self):
+        # Shared across managers so HTTP connection pools are reused
+        if self._llm is None:
+            self._llm = _get_llm()
+        return self._llm
+    
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = self._build_graph()
+        return self._graph
         
     def _build_graph(self):
         """Build the LangGraph state machine."""
         
         # Define the nodes
-        def create_agent(llm, tools, system_prompt):
+        def create_agent(llm, tools, system_prompt: SystemMessage):
             if llm is None:
                 return None
-            return create_react_agent(llm, tools, prompt=system_prompt)
+            # Let the model emit several tool calls per turn; in the async path
+            # ToolNode runs all calls from one AIMessage concurrently with asyncio.gather
+            model = llm.bind_tools(tools, parallel_tool_calls=True)
+            return create_react_agent(model, ToolNode(tools), prompt=system_prompt)
             
-        scheduler = create_agent(self.llm, self.scheduler_tools, get_scheduler_agent_instructions())
-        political = create_agent(self.llm, self.political_tools, get_political_risk_agent_instructions())
-        tariff = create_agent(self.llm, self.tariff_tools, get_tariff_risk_agent_instructions())
-        logistics = create_agent(self.llm, self.logistics_tools, get_logistics_risk_agent_instructions())
-        reporting = create_agent(self.llm, self.reporting_tools, get_reporting_agent_instructions())
-        assistant = create_agent(self.llm, self.assistant_tools, get_assistant_agent_instructions())
+        tools = _get_agent_tools()
+        scheduler = create_agent(self.llm, tools[SCHEDULER_AGENT], _AGENT_PROMPTS[SCHEDULER_AGENT])
+        political = create_agent(self.llm, tools[POLITICAL_RISK_AGENT], _AGENT_PROMPTS[POLITICAL_RISK_AGENT])
+        tariff = create_agent(self.llm, tools[TARIFF_RISK_AGENT], _AGENT_PROMPTS[TARIFF_RISK_AGENT])
+        logistics = create_agent(self.llm, tools[LOGISTICS_RISK_AGENT], _AGENT_PROMPTS[LOGISTICS_RISK_AGENT])
+        reporting = create_agent(self.llm, tools[REPORTING_AGENT], _AGENT_PROMPTS[REPORTING_AGENT])
+        assistant = create_agent(self.llm, tools[ASSISTANT_AGENT], _AGENT_PROMPTS[ASSISTANT_AGENT])
         
         def _inject_ids(state: AgentState):
             """Create a SystemMessage with session/conversation IDs for agents to use in tool calls."""
@@ -95,13 +240,24 @@ class ChatbotManager:
                 f"If calling save_report_to_file, include recipient_email=\"{state.get('user_email', '')}\"."
             )
 
+        async def _stream_final_content(agent, messages: list, agent_name: str) -> str:
+            """Stream an agent run and keep only its latest message instead of the full final state."""
+            content = ""
+            # The tag lets stream_message attribute this agent's tokens
+            config = {"tags": [agent_name], "run_name": agent_name}
+            async for update in agent.astream({"messages": messages}, config=config, stream_mode="updates"):
+                for node_update in update.values():
+                    node_messages = (node_update or {}).get("messages")
+                    if node_messages:
+                        content = node_messages[-1].content
+            return content
+
         async def _safe_invoke(agent, state: AgentState, agent_name: str):
             """Invoke an agent with error handling and retry on Groq tool_use_failed errors."""
             id_msg = _inject_ids(state)
-            messages = [id_msg] + list(state["messages"])
+            messages = [id_msg] + _label_agent_messages(_trim_history(state["messages"]))
             try:
-                result = await agent.ainvoke({"messages": messages})
-                return result["messages"][-1].content
+                return await _stream_final_content(agent, messages, agent_name)
             except Exception as e:
                 error_str = str(e)
                 if "tool_use_failed" in error_str or "400" in error_str:
@@ -110,8 +266,7 @@ class ChatbotManager:
                     human_msgs = [msg for msg in state["messages"] if isinstance(msg, HumanMessage)]
                     if human_msgs:
                         try:
-                            result = await agent.ainvoke({"messages": [id_msg] + human_msgs})
-                            return result["messages"][-1].content
+                            return await _stream_final_content(agent, [id_msg] + human_msgs, agent_name)
                         except Exception as retry_error:
                             print(f"[{agent_name}] Retry also failed: {retry_error}")
                             return f"I processed your request but encountered a formatting issue. Please try again."
@@ -120,125 +275,131 @@ class ChatbotManager:
         async def run_scheduler(state: AgentState):
             if not scheduler: return {"messages": [AIMessage(content="Agent not available")]}
             content = await _safe_invoke(scheduler, state, SCHEDULER_AGENT)
-            log_agent_event.invoke({
+            log_in_background(log_agent_event, {
                 "agent_name": SCHEDULER_AGENT, 
                 "action": "Generated schedule analysis", 
                 "conversation_id": state["conversation_id"], 
                 "session_id": state["session_id"],
                 "agent_output": content
             })
-            return {"messages": [AIMessage(content=f"SCHEDULER_AGENT > {content}")]}
+            return {"messages": [_agent_message(SCHEDULER_AGENT, content)]}
             
         async def run_political(state: AgentState):
             if not political: return {"messages": [AIMessage(content="Agent not available")]}
             content = await _safe_invoke(political, state, POLITICAL_RISK_AGENT)
-            log_agent_event.invoke({
+            log_in_background(log_agent_event, {
                 "agent_name": POLITICAL_RISK_AGENT, 
                 "action": "Generated political risk analysis", 
                 "conversation_id": state["conversation_id"], 
                 "session_id": state["session_id"],
                 "agent_output": content
             })
-            return {"messages": [AIMessage(content=f"POLITICAL_RISK_AGENT > {content}")]}
+            return {"messages": [_agent_message(POLITICAL_RISK_AGENT, content)]}
 
         async def run_tariff(state: AgentState):
             if not tariff: return {"messages": [AIMessage(content="Agent not available")]}
             content = await _safe_invoke(tariff, state, TARIFF_RISK_AGENT)
-            return {"messages": [AIMessage(content=f"TARIFF_RISK_AGENT > {content}")]}
+            return {"messages": [_agent_message(TARIFF_RISK_AGENT, content)]}
 
         async def run_logistics(state: AgentState):
             if not logistics: return {"messages": [AIMessage(content="Agent not available")]}
             content = await _safe_invoke(logistics, state, LOGISTICS_RISK_AGENT)
-            return {"messages": [AIMessage(content=f"LOGISTICS_RISK_AGENT > {content}")]}
+            return {"messages": [_agent_message(LOGISTICS_RISK_AGENT, content)]}
 
         async def run_reporting(state: AgentState):
             if not reporting: return {"messages": [AIMessage(content="Agent not available")]}
             content = await _safe_invoke(reporting, state, REPORTING_AGENT)
-            return {"messages": [AIMessage(content=f"REPORTING_AGENT > {content}")]}
+            return {"messages": [_agent_message(REPORTING_AGENT, content)]}
 
         async def run_assistant(state: AgentState):
             if not assistant: return {"messages": [AIMessage(content="Agent not available")]}
             content = await _safe_invoke(assistant, state, ASSISTANT_AGENT)
-            return {"messages": [AIMessage(content=f"ASSISTANT_AGENT > {content}")]}
+            return {"messages": [_agent_message(ASSISTANT_AGENT, content)]}
             
-        # Router node
-        async def router(state: AgentState) -> dict:
-            last_message = state["messages"][-1].content.lower()
+        def _requested_risk_runners(query: str):
+            requested = _match_routes(query, _FOLLOWUP_PATTERN, _FOLLOWUP_MAP)
+            return [runner for node, runner in (
+                (POLITICAL_RISK_AGENT, run_political),
+                (TARIFF_RISK_AGENT, run_tariff),
+                (LOGISTICS_RISK_AGENT, run_logistics),
+            ) if node in requested]
+
+        async def run_risk_fanout(state: AgentState):
+            """Run every requested risk agent concurrently off the same scheduler output."""
+            runners = _requested_risk_runners(state.get("original_query", ""))
+            results = await asyncio.gather(*(runner(state) for runner in runners))
+            return {
+                "messages": [msg for result in results for msg in result["messages"]],
+                "risk_outputs_count": len(runners)
+            }
             
-            if "political" in last_message:
-                return {"next_node": POLITICAL_RISK_AGENT}
-            elif "tariff" in last_message:
-                return {"next_node": TARIFF_RISK_AGENT}
-            elif "logistics" in last_message or "shipping" in last_message:
-                return {"next_node": LOGISTICS_RISK_AGENT}
-            elif any(kw in last_message for kw in [
-                "schedule", "risk", "shipment", "delivery", "deliveries",
-                "equipment", "project", "order", "delay", "variance",
-                "due date", "status", "track", "all my", "show me",
-                "view all", "list all", "report", "generate"
-            ]):
-                return {"next_node": SCHEDULER_AGENT}
-            else:
-                return {"next_node": ASSISTANT_AGENT}
-                
-        def route_after_router(state: AgentState):
-            return state["next_node"]
+        # Router edge: a pure routing decision, so it doesn't need its own node
+        def route_from_start(state: AgentState):
+            matches = _match_routes(state["messages"][-1].content, _ROUTER_PATTERN, _ROUTER_MAP)
+            next_node = min(matches, key=_ROUTER_PRIORITY.get, default=ASSISTANT_AGENT)
+            # Earlier turns in this session may already carry the scheduler's analysis
+            # (_trim_history always hands that reply to the agents)
+            has_schedule_context = _last_schedule_index(state["messages"][:-1]) is not None
+            if has_schedule_context and next_node in (
+                POLITICAL_RISK_AGENT, TARIFF_RISK_AGENT, LOGISTICS_RISK_AGENT
+            ):
+                return "risk_fanout"
+            return next_node
             
         workflow = StateGraph(AgentState)
         
-        workflow.add_node("router", router)
         workflow.add_node(SCHEDULER_AGENT, run_scheduler)
-        workflow.add_node(POLITICAL_RISK_AGENT, run_political)
-        workflow.add_node(TARIFF_RISK_AGENT, run_tariff)
-        workflow.add_node(LOGISTICS_RISK_AGENT, run_logistics)
+        workflow.add_node("risk_fanout", run_risk_fanout)
         workflow.add_node(REPORTING_AGENT, run_reporting)
         workflow.add_node(ASSISTANT_AGENT, run_assistant)
         
-        workflow.add_edge(START, "router")
-        
         workflow.add_conditional_edges(
-            "router",
-            route_after_router,
+            START,
+            route_from_start,
             {
                 SCHEDULER_AGENT: SCHEDULER_AGENT,
                 POLITICAL_RISK_AGENT: SCHEDULER_AGENT, # Requires baseline data first
                 TARIFF_RISK_AGENT: SCHEDULER_AGENT,
                 LOGISTICS_RISK_AGENT: SCHEDULER_AGENT,
                 REPORTING_AGENT: SCHEDULER_AGENT, # Collect data first, then generate report
-                ASSISTANT_AGENT: ASSISTANT_AGENT
+                ASSISTANT_AGENT: ASSISTANT_AGENT,
+                "risk_fanout": "risk_fanout" # Schedule data already in the session history
             }
         )
         
         def route_after_scheduler(state: AgentState):
-            first_msg_idx = -1
-            for i, msg in reversed(list(enumerate(state["messages"]))):
-                if isinstance(msg, HumanMessage):
-                    first_msg_idx = i
-                    break
-            
-            if first_msg_idx >= 0:
-                first_msg = state["messages"][first_msg_idx].content.lower()
-                if "political" in first_msg: return POLITICAL_RISK_AGENT
-                if "tariff" in first_msg: return TARIFF_RISK_AGENT
-                if "logistic" in first_msg or "shipping" in first_msg: return LOGISTICS_RISK_AGENT
-                if "report" in first_msg: return REPORTING_AGENT
+            matches = _match_routes(state.get("original_query", ""), _FOLLOWUP_PATTERN, _FOLLOWUP_MAP)
+            if matches - {REPORTING_AGENT}: return "risk_fanout"
+            if REPORTING_AGENT in matches: return REPORTING_AGENT
             return END
             
         workflow.add_conditional_edges(
             SCHEDULER_AGENT,
             route_after_scheduler,
             {
-                POLITICAL_RISK_AGENT: POLITICAL_RISK_AGENT,
-                TARIFF_RISK_AGENT: TARIFF_RISK_AGENT,
-                LOGISTICS_RISK_AGENT: LOGISTICS_RISK_AGENT,
+                "risk_fanout": "risk_fanout",
                 REPORTING_AGENT: REPORTING_AGENT,
                 END: END
             }
         )
         
-        workflow.add_edge(POLITICAL_RISK_AGENT, REPORTING_AGENT)
-        workflow.add_edge(TARIFF_RISK_AGENT, REPORTING_AGENT)
-        workflow.add_edge(LOGISTICS_RISK_AGENT, REPORTING_AGENT)
+        def route_after_risk(state: AgentState):
+            # A single risk agent already returns a full markdown analysis; only
+            # consolidate when several ran or the user explicitly asked for a report
+            if state.get("risk_outputs_count", 0) > 1:
+                return REPORTING_AGENT
+            if REPORTING_AGENT in _match_routes(state.get("original_query", ""), _FOLLOWUP_PATTERN, _FOLLOWUP_MAP):
+                return REPORTING_AGENT
+            return END
+            
+        workflow.add_conditional_edges(
+            "risk_fanout",
+            route_after_risk,
+            {
+                REPORTING_AGENT: REPORTING_AGENT,
+                END: END
+            }
+        )
         
         workflow.add_edge(REPORTING_AGENT, END)
         workflow.add_edge(ASSISTANT_AGENT, END)
@@ -246,48 +407,71 @@ class ChatbotManager:
         return workflow.compile()
 
     async def initialize_session(self, session_id: str):
-        if session_id not in self.sessions:
+        if session_id in self.sessions:
+            self.sessions.move_to_end(session_id)
+        else:
             self.sessions[session_id] = {
                 "conversation_id": str(uuid.uuid4()),
                 "messages": []
             }
+            # Evict least recently used sessions
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
         return self.sessions[session_id]
         
     async def cleanup_sessions(self, max_age_minutes=0):
         self.sessions.clear()
 
+    async def _start_turn(self, session_id: str, message: str, user_email: str = None):
+        """Build the graph input state for a new user message and log the query."""
+        session = await self.initialize_session(session_id)
+        conversation_id = session["conversation_id"]
+        
+        input_message = HumanMessage(content=message)
+        state = {
+            "messages": session["messages"] + [input_message],
+            "session_id": session_id,
+            "conversation_id": conversation_id,
+            "user_email": user_email or "",
+            "original_query": message,
+            "risk_outputs_count": 0
+        }
+        
+        # Log user query
+        log_in_background(log_agent_event, {
+            "agent_name": "USER",
+            "action": "User Query",
+            "user_query": message,
+            "conversation_id": conversation_id,
+            "session_id": session_id
+        })
+        
+        return session, input_message, state
+
+    def _finish_turn(self, session: dict, input_message: HumanMessage, final_message: AIMessage):
+        """Record a completed turn in the session history."""
+        session["messages"].append(input_message)
+        # Keep the final message itself so its agent tag survives into later turns
+        session["messages"].append(final_message)
+        # Keep only the most recent turns so prompts don't grow without bound
+        session["messages"] = session["messages"][-MAX_TURNS * 2:]
+
     async def process_message(self, session_id: str, message: str, user_email: str = None) -> Dict[str, Any]:
         """Main entry point for API chat processing."""
         try:
-            session = await self.initialize_session(session_id)
-            conversation_id = session["conversation_id"]
-            
-            input_message = HumanMessage(content=message)
-            state = {
-                "messages": session["messages"] + [input_message],
-                "session_id": session_id,
-                "conversation_id": conversation_id,
-                "next_node": "",
-                "user_email": user_email or ""
-            }
-            
-            # Log user query
-            log_agent_event.invoke({
-                "agent_name": "USER",
-                "action": "User Query",
-                "user_query": message,
-                "conversation_id": conversation_id,
-                "session_id": session_id
-            })
+            session, input_message, state = await self._start_turn(session_id, message, user_email)
+            conversation_id = state["conversation_id"]
             
             # Form final result
             final_state = await self.graph.ainvoke(state)
             
             # The last message is the response
-            final_response = final_state["messages"][-1].content
+            final_message = final_state["messages"][-1]
+            final_response = final_message.content
             
-            session["messages"].append(input_message)
-            session["messages"].append(AIMessage(content=final_response))
+            self._finish_turn(session, input_message, final_message)
+            # /api/heatmap reads this turn's risk JSON events right after the response
+            await asyncio.to_thread(flush_logs)
             
             return {
                 "status": "success",
@@ -302,4 +486,91 @@ class ChatbotManager:
             return {
                 "status": "error",
                 "error": str(e)
-            }
\ No newline at end of file
+            }
+
+    async def stream_message(self, session_id: str, message: str, user_email: str = None):
+        """Stream a chat response as it is generated.
+        
+        Risk agents in the fan-out run concurrently, so their tokens interleave;
+        consumers should group token events by their "agent" field.
+        
+        Yields:
+            dict: {"type": "token", "agent": ..., "content": ...} for each answer token,
+            then a final {"type": "final", "status": ..., "response": ..., "conversation_id": ...}
+        """
+        try:
+            session, input_message, state = await self._start_turn(session_id, message, user_email)
+            conversation_id = state["conversation_id"]
+            final_message = AIMessage(content="")
+            
+            async for event in self.graph.astream_events(state, version="v2"):
+                kind = event["event"]
+                if kind == "on_chat_model_stream":
+                    chunk = event["data"]["chunk"]
+                    # Tool-call turns are part of the ReAct loop, not the answer
+                    if chunk.content and not getattr(chunk, "tool_call_chunks", None):
+                        agent_name = next((tag for tag in event.get("tags", ()) if tag in _AGENT_PROMPTS), None)
+                        yield {"type": "token", "agent": agent_name, "content": chunk.content}
+                elif kind == "on_chain_end" and event.get("parent_ids") == []:
+                    # Top-level graph finished; its output is the final state
+                    final_message = event["data"]["output"]["messages"][-1]
+            
+            self._finish_turn(session, input_message, final_message)
+            # /api/heatmap reads this turn's risk JSON events right after the response
+            await asyncio.to_thread(flush_logs)
+            
+            yield {
+                "type": "final",
+                "status": "success",
+                "response": final_message.content,
+                "conversation_id": conversation_id
+            }
+            
+        except Exception as e:
+            logging.error(f"Error streaming message: {e}")
+            yield {
+                "type": "final",
+                "status": "error",
+                "error": str(e)
+            }
+
+    async def process_batch(self, items: List[tuple], user_email: str = None,
+                            max_concurrency: int = 4, rate_limit: float = None) -> List[Dict[str, Any]]:
+        """Process several (session_id, message) pairs concurrently.
+        
+        Messages for the same session run one after another, in the order given,
+        so each turn sees the previous one's history. Different sessions run
+        concurrently.
+        
+        Args:
+            items: List of (session_id, message) tuples
+            user_email: Optional email passed to every message
+            max_concurrency: Maximum number of graph runs in flight at once
+            rate_limit: Optional maximum number of graph runs started per second
+            
+        Returns:
+            List of result dicts, aligned by index with items
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        min_interval = 1.0 / rate_limit if rate_limit else 0.0
+        loop = asyncio.get_running_loop()
+        batch_start = loop.time()
+        results = [None] * len(items)
+        
+        groups = OrderedDict()  # session_id -> [(index, message), ...]
+        for index, (session_id, message) in enumerate(items):
+            groups.setdefault(session_id, []).append((index, message))
+        
+        async def _run_group(session_id: str, group: list):
+            for index, message in group:
+                if min_interval:
+                    await asyncio.sleep(max(0.0, batch_start + index * min_interval - loop.time()))
+                try:
+                    async with semaphore:
+                        results[index] = await self.process_message(session_id, message, user_email=user_email)
+                except Exception as e:
+                    results[index] = {"status": "error", "error": str(e)}
+        
+        await asyncio.gather(*(_run_group(session_id, group) for session_id, group in groups.items()))
+        
+        return results
@@ -5,10 +5,15 @@ import asyncio
 import json
 import logging
 from datetime import datetime
+from typing import AsyncIterator
 
 from langchain_core.messages import HumanMessage
 
+from agents.agent_definitions import REPORTING_AGENT
 from managers.chatbot_manager import ChatbotManager
+from plugins.logging_plugin import flush_logs
+
+logger = logging.getLogger(__name__)
 
 
 class AutomatedWorkflowManager:
@@ -22,44 +27,70 @@ class AutomatedWorkflowManager:
         """
         self.chatbot_manager = ChatbotManager()
     
-    async def run_workflow(self) -> dict:
-        """Runs the automated schedule analysis workflow.
+    async def stream_workflow(self) -> AsyncIterator[dict]:
+        """Runs the automated schedule analysis workflow, streaming the report.
         
-        Returns:
-            dict: Result of the workflow execution
+        Yields:
+            dict: {"status": "partial", "delta": ...} for each reporting agent token, then
+            the same final success or error dict that run_workflow returns
         """
+        # Built up front so the error result can always report the run ID
+        session_id = f"workflow_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        workflow_run_id = str(uuid.uuid4())
+        
         try:
-            session_id = f"workflow_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            workflow_run_id = str(uuid.uuid4())
-            
             # Run the schedule analysis through the chatbot manager
-            result = await self.chatbot_manager.process_message(
+            async for event in self.chatbot_manager.stream_message(
                 session_id=session_id,
                 message="Analyze the current equipment schedule and generate a comprehensive risk report."
-            )
-            
-            if result.get("status") == "success":
-                return {
-                    "status": "success",
-                    "report": result.get("response", ""),
-                    "workflow_run_id": workflow_run_id,
-                    "session_id": session_id,
-                    "conversation_id": result.get("conversation_id"),
-                    "timestamp": datetime.now().isoformat()
-                }
-            else:
-                return {
-                    "status": "error",
-                    "error": result.get("error", "Unknown error"),
-                    "workflow_run_id": workflow_run_id
-                }
+            ):
+                if event["type"] == "token":
+                    # Only the reporting agent's tokens make up the report;
+                    # scheduler and risk agent output would garble the deltas
+                    if event.get("agent") == REPORTING_AGENT:
+                        yield {"status": "partial", "delta": event["content"]}
+                    continue
+                
+                if event.get("status") == "success":
+                    yield {
+                        "status": "success",
+                        "report": event.get("response", ""),
+                        "workflow_run_id": workflow_run_id,
+                        "session_id": session_id,
+                        "conversation_id": event.get("conversation_id"),
+                        "timestamp": datetime.now().isoformat()
+                    }
+                else:
+                    yield {
+                        "status": "error",
+                        "error": event.get("error", "Unknown error"),
+                        "workflow_run_id": workflow_run_id
+                    }
                 
         except Exception as e:
-            logging.error(f"Error running automated workflow: {e}")
-            import traceback
-            traceback.print_exc()
-            return {
+            logger.exception("Error running automated workflow")
+            yield {
                 "status": "error",
                 "error": str(e),
-                "workflow_run_id": workflow_run_id if 'workflow_run_id' in locals() else None
+                "workflow_run_id": workflow_run_id
             }
+    
+    async def run_workflow(self) -> dict:
+        """Runs the automated schedule analysis workflow.
+        
+        Returns:
+            dict: Result of the workflow execution
+        """
+        result = await collect_workflow_result(self.stream_workflow())
+        # Write the run's buffered log rows before reporting it as finished
+        await asyncio.to_thread(flush_logs)
+        return result
+
+
+async def collect_workflow_result(events: AsyncIterator[dict]) -> dict:
+    """Drains a stream_workflow iterator and returns its final result dict."""
+    result = {"status": "error", "error": "Workflow produced no result"}
+    async for event in events:
+        if event["status"] != "partial":
+            result = event
+    return result
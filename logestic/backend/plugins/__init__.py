@@ -1,31 +1,46 @@
-"""Plugins module initialization."""
-
-from .schedule_plugin import get_schedule_comparison_data
-from .risk_plugin import calculate_risk_percentage, categorize_risk
-from .logging_plugin import (
-    log_agent_thinking, log_agent_event, log_agent_response,
-    log_agent_error, get_agent_thinking_logs, get_conversation_history,
-    get_recent_conversations
-)
-from .report_file_plugin import ReportFilePlugin, save_report_to_file
-from .political_risk_json_plugin import convert_to_json, store_political_json_output_agent_event, extract_citations
-from .citation_handler_plugin import CitationLoggerPlugin
-
-__all__ = [
-    'get_schedule_comparison_data',
-    'calculate_risk_percentage',
-    'categorize_risk',
-    'log_agent_thinking',
-    'log_agent_event',
-    'log_agent_response',
-    'log_agent_error',
-    'get_agent_thinking_logs',
-    'get_conversation_history',
-    'get_recent_conversations',
-    'ReportFilePlugin',
-    'save_report_to_file',
-    'convert_to_json',
-    'store_political_json_output_agent_event',
-    'extract_citations',
-    'CitationLoggerPlugin',
-]
\ No newline at end of file
+"""Plugins module initialization.
+
+Plugins are imported on first attribute access, so importing one submodule
+(e.g. plugins.logging_plugin) does not load Spire.Doc, langchain_community
+or the other plugins' dependencies.
+"""
+
+import importlib
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    'get_schedule_comparison_data': '.schedule_plugin',
+    'calculate_risk_percentage': '.risk_plugin',
+    'categorize_risk': '.risk_plugin',
+    'log_agent_thinking': '.logging_plugin',
+    'log_agent_event': '.logging_plugin',
+    'log_agent_response': '.logging_plugin',
+    'log_agent_error': '.logging_plugin',
+    'get_agent_thinking_logs': '.logging_plugin',
+    'get_conversation_history': '.logging_plugin',
+    'get_recent_conversations': '.logging_plugin',
+    'log_in_background': '.logging_plugin',
+    'start_log_flusher': '.logging_plugin',
+    'flush_logs': '.logging_plugin',
+    'ReportFilePlugin': '.report_file_plugin',
+    'save_report_to_file': '.report_file_plugin',
+    'convert_to_json': '.political_risk_json_plugin',
+    'store_political_json_output_agent_event': '.political_risk_json_plugin',
+    'extract_citations': '.political_risk_json_plugin',
+    'CitationLoggerPlugin': '.citation_handler_plugin',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
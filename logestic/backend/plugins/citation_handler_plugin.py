@@ -1,25 +1,43 @@
 """Plugin for retrieving and formatting citations from search results."""
 
-import json
-import re
+import logging
+import threading
+import orjson
+from collections import OrderedDict
 from langchain_core.tools import tool
 
+logger = logging.getLogger(__name__)
+
+_REFERENCES_HEADER = "### References"
+
 
 class CitationLoggerPlugin:
     """A plugin for formatting and managing citations from search results."""
     
-    def __init__(self):
-        """Initialize the plugin."""
-        self._cached_citations = {}  # Cache citations by conversation_id
+    def __init__(self, max_cached_conversations: int = 256):
+        """Initialize the plugin.
+        
+        Args:
+            max_cached_conversations: Number of conversations whose citations are kept
+        """
+        self._cached_citations = OrderedDict()  # Cache citations by conversation_id
+        self._max_cached_conversations = max_cached_conversations
+        self._cache_lock = threading.Lock()
     
     def cache_citations(self, conversation_id: str, citations: list):
         """Cache citations for a conversation.
         
+        The least recently cached conversations are dropped once the cache is full.
+        
         Args:
             conversation_id: The conversation ID
             citations: List of citation dictionaries
         """
-        self._cached_citations[conversation_id] = citations
+        with self._cache_lock:
+            self._cached_citations[conversation_id] = citations
+            self._cached_citations.move_to_end(conversation_id)
+            while len(self._cached_citations) > self._max_cached_conversations:
+                self._cached_citations.popitem(last=False)
     
     def get_cached_citations(self, conversation_id: str) -> list:
         """Get cached citations for a conversation.
@@ -32,28 +50,41 @@ class CitationLoggerPlugin:
         """
         return self._cached_citations.get(conversation_id, [])
     
-    def format_citations_as_markdown(self, citations: list) -> str:
-        """Format citations as markdown.
+    def iter_citations_markdown(self, citations: list):
+        """Yield the citation section as markdown, one chunk per citation.
+        
+        Useful when writing a large References section to a stream or file
+        without building the whole string first.
         
         Args:
             citations: List of citation dictionaries
             
-        Returns:
-            str: Formatted citation section as markdown
+        Yields:
+            str: The section header, then one numbered entry per citation
         """
         if not citations:
-            return "### References\n\nNo citations available."
-            
-        citation_section = "### References\n\n"
+            yield "### References\n\nNo citations available."
+            return
         
-        for i, citation in enumerate(citations):
+        yield "### References\n\n"
+        
+        for i, citation in enumerate(citations, 1):
             title = citation.get("title", "Unknown Source")
             url = citation.get("url", "#")
             source = citation.get("source", "Unknown")
             
-            citation_section += f'{i+1}. ["{title}" - {source}]({url})\n\n'
+            yield f'{i}. ["{title}" - {source}]({url})\n\n'
+    
+    def format_citations_as_markdown(self, citations: list) -> str:
+        """Format citations as markdown.
         
-        return citation_section
+        Args:
+            citations: List of citation dictionaries
+            
+        Returns:
+            str: Formatted citation section as markdown
+        """
+        return "".join(self.iter_citations_markdown(citations))
     
     def extract_source_from_title(self, title: str) -> str:
         """Extract the source name from a citation title.
@@ -65,14 +96,11 @@ class CitationLoggerPlugin:
             str: The extracted source name
         """
         # Many citation titles follow the format: "Title - Source, Date"
-        if " - " in title:
-            parts = title.split(" - ")
-            if len(parts) > 1:
-                source_part = parts[-1].strip()
-                # Further extract if there's a comma with date
-                if "," in source_part:
-                    return source_part.split(",")[0].strip()
-                return source_part
+        parts = title.rsplit(" - ", 1)
+        if len(parts) == 2:
+            source_part = parts[1].strip()
+            # Further extract if there's a comma with date
+            return source_part.split(",", 1)[0].strip()
         
         # Default to returning the title itself if no clear source
         return title
@@ -91,17 +119,26 @@ class CitationLoggerPlugin:
             if not citations:
                 return agent_output
             
+            references_section = self.format_citations_as_markdown(citations)
+            
             # Check if the output already has a References section
-            if "### References" in agent_output:
-                # Replace the existing References section
-                pattern = r'### References.*?(?=###|\Z)'
-                references_section = self.format_citations_as_markdown(citations)
-                enhanced_output = re.sub(pattern, references_section, agent_output, flags=re.DOTALL)
-                return enhanced_output
+            start = agent_output.find(_REFERENCES_HEADER)
+            if start >= 0:
+                # Replace each References section up to the next ### header
+                parts = []
+                end = 0
+                while start >= 0:
+                    parts.append(agent_output[end:start])
+                    parts.append(references_section)
+                    end = agent_output.find("###", start + len(_REFERENCES_HEADER))
+                    if end < 0:
+                        end = len(agent_output)
+                        break
+                    start = agent_output.find(_REFERENCES_HEADER, end)
+                parts.append(agent_output[end:])
+                return "".join(parts)
             else:
                 # Add the References section at the end
-                references_section = self.format_citations_as_markdown(citations)
-                
                 if not agent_output.endswith("\n\n"):
                     enhanced_output = agent_output + "\n\n" + references_section
                 else:
@@ -110,10 +147,26 @@ class CitationLoggerPlugin:
                 return enhanced_output
                 
         except Exception as e:
-            print(f"Error enhancing output with citations: {e}")
+            logger.warning("Error enhancing output with citations: %s", e, exc_info=True)
             return agent_output
 
 
+def _parse_citations(citations_json) -> list:
+    """Returns the citation list from a tool argument that may already be parsed.
+    
+    Raises:
+        TypeError: If the argument does not hold a list of citations
+    """
+    citations = citations_json if isinstance(citations_json, list) else orjson.loads(citations_json)
+    if not isinstance(citations, list):
+        raise TypeError(f"Expected a list of citations, got {type(citations).__name__}")
+    return citations
+
+
+# Shared by the tools below so each call doesn't build a new plugin and lose its cache
+_citation_plugin = CitationLoggerPlugin()
+
+
 @tool
 def get_formatted_citations(citations_json: str) -> str:
     """Format citations list as markdown.
@@ -125,24 +178,24 @@ def get_formatted_citations(citations_json: str) -> str:
         str: JSON string with formatted citations
     """
     try:
-        citations = json.loads(citations_json) if isinstance(citations_json, str) else citations_json
-        plugin = CitationLoggerPlugin()
+        citations = _parse_citations(citations_json)
+        plugin = _citation_plugin
         markdown = plugin.format_citations_as_markdown(citations)
         
-        return json.dumps({
+        return orjson.dumps({
             "success": True,
             "citation_count": len(citations),
             "citations": citations,
             "markdown": markdown
-        })
+        }).decode()
     except Exception as e:
-        return json.dumps({
+        return orjson.dumps({
             "error": str(e),
             "success": False,
             "citation_count": 0,
             "citations": [],
             "markdown": "### References\n\nUnable to retrieve citations."
-        })
+        }).decode()
 
 
 @tool
@@ -157,9 +210,9 @@ def enhance_political_risk_output(agent_output: str, citations_json: str) -> str
         str: Enhanced output with proper citations
     """
     try:
-        citations = json.loads(citations_json) if isinstance(citations_json, str) else citations_json
-        plugin = CitationLoggerPlugin()
+        citations = _parse_citations(citations_json)
+        plugin = _citation_plugin
         return plugin.enhance_output_with_citations(agent_output, citations)
     except Exception as e:
-        print(f"Error enhancing political risk output: {e}")
+        logger.warning("Error enhancing political risk output: %s", e, exc_info=True)
         return agent_output
\ No newline at end of file
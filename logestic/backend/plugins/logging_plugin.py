@@ -1,12 +1,164 @@
 """Consolidated logging helpers for agent and event logging."""
 
-import json
+import os
 import uuid
+import orjson
+import time
+import queue
+import atexit
+import asyncio
+import threading
 from typing import Optional
 from datetime import datetime
 from langchain_core.tools import tool
 from utils.database_utils import insert_table_with_retry, get_connection
 
+# msgspec's reusable encoder is the fastest option for the logging hot path
+try:
+    import msgspec
+    
+    _msgspec_encoder = msgspec.json.Encoder()
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+
+def _encode_json(obj) -> str:
+    """Encodes obj as a JSON string with msgspec, falling back to orjson."""
+    if MSGSPEC_AVAILABLE:
+        return _msgspec_encoder.encode(obj).decode()
+    return orjson.dumps(obj).decode()
+
+
+# Longest text stored per log column
+_MAX_TEXT_LENGTH = 50000
+
+
+def _normalize_text(value, limit: int = _MAX_TEXT_LENGTH) -> Optional[str]:
+    """Serializes non-string values to JSON and truncates text longer than limit."""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        try:
+            value = _encode_json(value)
+        except Exception:
+            value = str(value)
+    if len(value) > limit:
+        return value[:limit] + "... [TRUNCATED]"
+    return value
+
+
+# Bound once; these run for every buffered log row
+_u4 = uuid.uuid4
+_now = datetime.now
+
+# Strong references to in-flight background log tasks so they aren't garbage collected
+_pending_log_tasks = set()
+
+# Buffered log rows as (table_name, row) tuples, written in bulk by a background flusher
+_LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "64"))
+_LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "0.5"))
+_log_queue = queue.Queue()
+_FLUSH_NOW = object()  # queued by flush_logs to close the flusher's open batch early
+_flusher_thread = None
+_flusher_lock = threading.Lock()
+
+
+def _write_log_batch(batch: list):
+    """Bulk inserts a batch of (table_name, row) tuples, one insert per table."""
+    rows_by_table = {}
+    for table_name, row in batch:
+        rows_by_table.setdefault(table_name, []).append(row)
+    
+    for table_name, rows in rows_by_table.items():
+        try:
+            insert_table_with_retry(table_name, rows)
+        except Exception as e:
+            print(f"Error flushing {len(rows)} rows to {table_name}: {e}")
+
+
+def _drain_log_queue() -> list:
+    """Takes up to _LOG_BATCH_SIZE queued items without blocking."""
+    batch = []
+    while len(batch) < _LOG_BATCH_SIZE:
+        try:
+            batch.append(_log_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _collect_log_batch(first_item) -> list:
+    """Gathers items after first_item until the batch is full, _LOG_FLUSH_INTERVAL
+    passes or a flush is requested."""
+    batch = [first_item]
+    deadline = time.monotonic() + _LOG_FLUSH_INTERVAL
+    while batch[-1] is not _FLUSH_NOW and len(batch) < _LOG_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_log_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _write_queued_items(batch: list):
+    """Writes the rows in batch and marks every item, flush markers included, as done."""
+    rows = [item for item in batch if item is not _FLUSH_NOW]
+    try:
+        if rows:
+            _write_log_batch(rows)
+    finally:
+        for _ in batch:
+            _log_queue.task_done()
+
+
+def _flusher_loop():
+    """Waits for queued rows and writes them in batches."""
+    while True:
+        first_item = _log_queue.get()
+        _write_queued_items(_collect_log_batch(first_item))
+
+
+def start_log_flusher():
+    """Starts the background log flusher thread if it isn't running yet."""
+    global _flusher_thread
+    if _flusher_thread is not None and _flusher_thread.is_alive():
+        return
+    with _flusher_lock:
+        if _flusher_thread is None or not _flusher_thread.is_alive():
+            _flusher_thread = threading.Thread(target=_flusher_loop, name="log-flusher", daemon=True)
+            _flusher_thread.start()
+
+
+def flush_logs():
+    """Synchronously writes every queued row, including a batch the flusher holds open.
+    
+    Returns once the rows are in the database, so callers can read them back.
+    """
+    if _flusher_thread is not None and _flusher_thread.is_alive():
+        _log_queue.put(_FLUSH_NOW)
+        _log_queue.join()
+        return
+    while True:
+        batch = _drain_log_queue()
+        if not batch:
+            break
+        _write_queued_items(batch)
+
+
+def enqueue_log_row(table_name: str, row: dict):
+    """Queues a row for the next bulk insert into table_name without blocking."""
+    if _flusher_thread is None:
+        start_log_flusher()
+    _log_queue.put_nowait((table_name, row))
+
+
+# Don't lose buffered rows when the process exits
+atexit.register(flush_logs)
+
 @tool
 def log_agent_thinking(agent_name: str, thinking_stage: str, thought_content: str, 
                        conversation_id: Optional[str] = None, session_id: Optional[str] = None, 
@@ -33,31 +185,15 @@ def log_agent_thinking(agent_name: str, thinking_stage: str, thought_content: st
     """
     try:
         if not conversation_id:
-            conversation_id = str(uuid.uuid4())
-        
-        if thinking_stage_output is not None and not isinstance(thinking_stage_output, str):
-            try:
-                thinking_stage_output = json.dumps(thinking_stage_output)
-            except Exception:
-                thinking_stage_output = str(thinking_stage_output)
-        
-        if agent_output is not None and not isinstance(agent_output, str):
-            try:
-                agent_output = json.dumps(agent_output)
-            except Exception:
-                agent_output = str(agent_output)
+            conversation_id = str(_u4())
         
         # Truncate to avoid extremely large text entries
-        max_text_length = 50000
-        if thought_content and len(thought_content) > max_text_length:
-            thought_content = thought_content[:max_text_length] + "... [TRUNCATED]"
-        if thinking_stage_output and len(thinking_stage_output) > max_text_length:
-            thinking_stage_output = thinking_stage_output[:max_text_length] + "... [TRUNCATED]"
-        if agent_output and len(agent_output) > max_text_length:
-            agent_output = agent_output[:max_text_length] + "... [TRUNCATED]"
+        thought_content = _normalize_text(thought_content)
+        thinking_stage_output = _normalize_text(thinking_stage_output)
+        agent_output = _normalize_text(agent_output)
         
         try:
-            insert_table_with_retry('dim_agent_thinking_log', {
+            row = {
                 'agent_name': agent_name,
                 'thinking_stage': thinking_stage,
                 'thought_content': thought_content,
@@ -70,14 +206,22 @@ def log_agent_thinking(agent_name: str, thinking_stage: str, thought_content: st
                 'thread_id': conversation_id,  # Thread ID logic is obsolete without Assistants API
                 'user_query': user_query,
                 'status': status,
-                'created_date': datetime.now().isoformat()
-            })
+                # Set here rather than by the column default, since buffered rows
+                # are inserted in batches that would share one NOW()
+                'created_date': _now().isoformat()
+            }
             
-            return json.dumps({"success": True, "conversation_id": conversation_id})
+            if status == "error":
+                # Error rows skip the buffer so they are stored even if the process dies
+                insert_table_with_retry('dim_agent_thinking_log', row)
+            else:
+                enqueue_log_row('dim_agent_thinking_log', row)
+            
+            return _encode_json({"success": True, "conversation_id": conversation_id})
             
         except Exception as db_error:
             print(f"Database error in log_agent_thinking: {db_error}")
-            return json.dumps({
+            return _encode_json({
                 "success": False, 
                 "error": str(db_error),
                 "conversation_id": conversation_id
@@ -85,7 +229,7 @@ def log_agent_thinking(agent_name: str, thinking_stage: str, thought_content: st
             
     except Exception as e:
         print(f"Error in log_agent_thinking: {e}")
-        return json.dumps({"error": str(e)})
+        return _encode_json({"error": str(e)})
 
 
 def log_agent_response(agent_name: str, response_content: str, 
@@ -108,28 +252,55 @@ def log_agent_response(agent_name: str, response_content: str,
 def log_agent_event(agent_name: str, action: str, result_summary: Optional[str] = None, 
                 conversation_id: Optional[str] = None, session_id: Optional[str] = None,
                 user_query: Optional[str] = None, agent_output: Optional[str] = None) -> str:
-    """Logs an agent event to the database (Supabase)."""
+    """Logs an agent event to the database (Supabase) via the batched log buffer."""
     try:
         if not conversation_id:
-            conversation_id = str(uuid.uuid4())
+            conversation_id = str(_u4())
             
-        insert_table_with_retry('dim_agent_event_log', {
+        enqueue_log_row('dim_agent_event_log', {
             'agent_name': agent_name,
-            'event_time': datetime.now().isoformat(),
+            'event_time': _now().isoformat(),
             'action': action,
             'result_summary': result_summary,
             'user_query': user_query,
             'agent_output': agent_output,
             'conversation_id': conversation_id,
             'session_id': session_id,
-            'event_id': str(uuid.uuid4())
+            # Postgres accepts the undashed hex form for UUID columns
+            'event_id': _u4().hex
         })
         
-        return json.dumps({"success": True, "conversation_id": conversation_id})
+        return _encode_json({"success": True, "conversation_id": conversation_id})
         
     except Exception as e:
         print(f"Error in log_agent_event: {str(e)}")
-        return json.dumps({"error": str(e)})
+        return _encode_json({"error": str(e)})
+
+
+def log_in_background(log_tool, payload: dict):
+    """Runs a logging tool in the background without waiting for the result.
+    
+    The tool only queues its row (the database write happens in the log
+    flusher), so this goes through the tool's async path. For these sync tools
+    LangChain runs the body in its executor, which keeps the text
+    normalization and JSON encoding of large agent outputs off the event loop.
+    
+    Args:
+        log_tool: The logging tool to invoke (e.g. log_agent_event)
+        payload: The tool input dict
+        
+    Returns:
+        The scheduled asyncio.Task, or the tool result if no event loop is running
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return log_tool.invoke(payload)
+    
+    task = loop.create_task(log_tool.ainvoke(payload))
+    _pending_log_tasks.add(task)
+    task.add_done_callback(_pending_log_tasks.discard)
+    return task
 
 
 def log_agent_error(agent_name: str, error_type: str, error_message: str,
@@ -165,11 +336,11 @@ def get_agent_thinking_logs(conversation_id: str = None,
             
         # Supabase API limits and ordering
         response = query.order('created_date', desc=True).limit(limit).execute()
-        return json.dumps(response.data, default=str)
+        return _encode_json(response.data)
         
     except Exception as e:
         print(f"Error retrieving thinking logs: {e}")
-        return json.dumps({"error": str(e)})
+        return _encode_json({"error": str(e)})
 
 
 def get_conversation_history(conversation_id: str) -> str:
@@ -180,11 +351,11 @@ def get_conversation_history(conversation_id: str) -> str:
             'log_id,agent_name,event_time,action,result_summary,user_query,agent_output'
         ).eq('conversation_id', conversation_id).order('event_time', desc=False).execute()
         
-        return json.dumps({"conversation_id": conversation_id, "events": response.data}, default=str)
+        return _encode_json({"conversation_id": conversation_id, "events": response.data})
         
     except Exception as e:
         print(f"Error in get_conversation_history: {str(e)}")
-        return json.dumps({"error": str(e)})
+        return _encode_json({"error": str(e)})
 
 
 def get_recent_conversations(limit: int = 10) -> str:
@@ -200,8 +371,8 @@ def get_recent_conversations(limit: int = 10) -> str:
         # So we'll call the rpc
         response = client.rpc('get_recent_conversations', {'row_limit': limit}).execute()
         
-        return json.dumps({"conversations": response.data}, default=str)
+        return _encode_json({"conversations": response.data})
         
     except Exception as e:
         print(f"Error in get_recent_conversations: {str(e)}")
-        return json.dumps({"error": str(e)})
\ No newline at end of file
+        return _encode_json({"error": str(e)})
\ No newline at end of file
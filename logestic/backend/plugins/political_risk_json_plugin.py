@@ -1,14 +1,71 @@
 """Plugin for converting political risk output to standardized JSON."""
 
-import json
 import uuid
 import re
+import orjson
 from datetime import datetime
 from langchain_core.tools import tool
-from utils.database_utils import insert_table_with_retry
+from plugins.logging_plugin import enqueue_log_row
 
-def convert_to_json_helper(risk_analysis: str) -> str:
-    """Convert political risk analysis to standardized JSON format."""
+
+def _dumps(obj, pretty: bool = False) -> str:
+    """Serializes obj to a JSON string, 2-space indented when pretty is set."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
+
+
+_QUERY_RE = re.compile(r'query:\s*"([^"]+)"', re.IGNORECASE)
+_USING_QUERY_RE = re.compile(r'using the query:?\s*"([^"]+)"', re.IGNORECASE)
+_RESULTS_COUNT_RE = re.compile(r'A total of (\d+) search results')
+
+# Result keys filled from the text that follows each section title
+_SECTION_KEYS = (
+    ("equipment_impact", "Equipment Impact Analysis"),
+    ("mitigation_recommendations", "Mitigation Recommendations"),
+    ("analysis_description", "Analysis Description"),
+)
+
+# Columns in a political risk table row: country | type | info | likelihood |
+# reasoning | date | citation title | source | url
+_TABLE_COLUMNS = 9
+
+
+def _find_section(chunks: list, title: str):
+    """Returns the text after the first occurrence of title up to the next ### header.
+    
+    Args:
+        chunks: The analysis text split on "###"
+        title: The section title to look for
+        
+    Returns:
+        The stripped section text, or None if title does not appear
+    """
+    for chunk in chunks:
+        start = chunk.find(title)
+        if start >= 0:
+            return chunk[start + len(title):].strip()
+    return None
+
+
+def _iter_table_rows(text: str):
+    """Yields the stripped cells of each markdown table row with a numeric likelihood.
+    
+    Header and separator rows are skipped because their likelihood column is
+    not a number.
+    """
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("|"):
+            continue
+        cells = line.strip("|").split("|")
+        if len(cells) < _TABLE_COLUMNS:
+            continue
+        cells = [cell.strip() for cell in cells[:_TABLE_COLUMNS]]
+        if cells[3].isdecimal():
+            yield cells
+
+
+def _build_risk_dict(risk_analysis: str) -> dict:
+    """Parse political risk analysis into the standardized JSON structure."""
     try:
         # Initialize the structure
         result = {
@@ -17,70 +74,53 @@ def convert_to_json_helper(risk_analysis: str) -> str:
         }
         
         # Extract from markdown table format
-        table_pattern = r"\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|\s*(\d+)\s*\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|"
-        matches = re.findall(table_pattern, risk_analysis)
-        
-        for match in matches:
-            if len(match) >= 9:
-                country = match[0].strip()
-                political_type = match[1].strip()
-                risk_info = match[2].strip()
-                likelihood = match[3].strip()
-                likelihood_reasoning = match[4].strip()
-                pub_date = match[5].strip()
-                citation_title = match[6].strip()
-                source_name = match[7].strip()
-                url = match[8].strip()
-                
-                if country.lower() == "country" and "political type" in political_type.lower():
-                    continue
-                
-                risk_entry = {
-                    "country": country,
-                    "political_type": political_type,
-                    "risk_information": risk_info,
-                    "likelihood": int(likelihood) if likelihood.isdigit() else 0,
-                    "likelihood_reasoning": likelihood_reasoning,
-                    "publication_date": pub_date,
-                    "citation_title": citation_title,
-                    "citation_name": source_name,
-                    "citation_url": url
-                }
-                result["political_risks"].append(risk_entry)
-        
-        query_match = re.search(r'query:\s*"([^"]+)"', risk_analysis, re.IGNORECASE)
+        for (country, political_type, risk_info, likelihood, likelihood_reasoning,
+             pub_date, citation_title, source_name, url) in _iter_table_rows(risk_analysis):
+            risk_entry = {
+                "country": country,
+                "political_type": political_type,
+                "risk_information": risk_info,
+                "likelihood": int(likelihood),
+                "likelihood_reasoning": likelihood_reasoning,
+                "publication_date": pub_date,
+                "citation_title": citation_title,
+                "citation_name": source_name,
+                "citation_url": url
+            }
+            result["political_risks"].append(risk_entry)
+        
+        query_match = _QUERY_RE.search(risk_analysis)
         if query_match:
             result["search_query"] = query_match.group(1)
         else:
-            query_match = re.search(r'using the query:?\s*"([^"]+)"', risk_analysis, re.IGNORECASE)
+            query_match = _USING_QUERY_RE.search(risk_analysis)
             if query_match:
                 result["search_query"] = query_match.group(1)
         
-        results_match = re.search(r'A total of (\d+) search results', risk_analysis)
+        results_match = _RESULTS_COUNT_RE.search(risk_analysis)
         if results_match:
             result["search_results_count"] = int(results_match.group(1))
         
-        impact_match = re.search(r'Equipment Impact Analysis.*?([\s\S]*?)(?=###|\Z)', risk_analysis, re.DOTALL)
-        if impact_match:
-            result["equipment_impact"] = impact_match.group(1).strip()
-        
-        recommendations_match = re.search(r'Mitigation Recommendations.*?([\s\S]*?)(?=###|\Z)', risk_analysis, re.DOTALL)
-        if recommendations_match:
-            result["mitigation_recommendations"] = recommendations_match.group(1).strip()
+        # Split on ### headers once and look each section up in the pieces
+        chunks = risk_analysis.split("###")
+        for key, title in _SECTION_KEYS:
+            section = _find_section(chunks, title)
+            if section is not None:
+                result[key] = section
         
-        analysis_match = re.search(r'Analysis Description.*?([\s\S]*?)(?=###|\Z)', risk_analysis, re.DOTALL)
-        if analysis_match:
-            result["analysis_description"] = analysis_match.group(1).strip()
-        
-        return json.dumps(result, indent=2)
+        return result
         
     except Exception as e:
         print(f"Error converting political risk analysis: {e}")
-        return json.dumps({
+        return {
             "error": str(e),
             "political_risks": [],
             "timestamp": datetime.now().isoformat()
-        })
+        }
+
+def convert_to_json_helper(risk_analysis: str) -> str:
+    """Convert political risk analysis to standardized JSON format."""
+    return _dumps(_build_risk_dict(risk_analysis), pretty=True)
 
 @tool
 def convert_to_json(risk_analysis: str) -> str:
@@ -91,32 +131,33 @@ def convert_to_json(risk_analysis: str) -> str:
 def store_political_json_output_agent_event(risk_analysis: str, agent_name: str, conversation_id: str, session_id: str) -> str:
     """Store political risk JSON in agent event log"""
     try:
-        json_data = convert_to_json_helper(risk_analysis)
+        # Parsed once; the dict is serialized for the row and reused in the tool result
+        parsed_data = _build_risk_dict(risk_analysis)
         event_id = str(uuid.uuid4())
         
-        # Insert using Supabase helper
-        insert_table_with_retry('dim_agent_event_log', {
+        # Queued for the batched event log writer instead of a round trip per event
+        enqueue_log_row('dim_agent_event_log', {
             'event_id': event_id,
             'agent_name': agent_name,
             'event_time': datetime.now().isoformat(),
             'action': "Political Risk JSON Data",
-            'result_summary': f"Structured JSON data with {len(json.loads(json_data).get('political_risks', []))} political risks",
+            'result_summary': f"Structured JSON data with {len(parsed_data.get('political_risks', []))} political risks",
             'user_query': None,
-            'agent_output': json_data,
+            'agent_output': _dumps(parsed_data),
             'conversation_id': conversation_id,
             'session_id': session_id
         })
         
-        return json.dumps({
+        return _dumps({
             "success": True,
             "message": "Political risk JSON data stored in agent event log",
             "event_id": event_id,
-            "json_data": json.loads(json_data)
+            "json_data": parsed_data
         })
         
     except Exception as e:
         print(f"Error storing political risk JSON: {e}")
-        return json.dumps({
+        return _dumps({
             "error": str(e),
             "message": "Failed to store political risk JSON in event log"
         })
@@ -126,43 +167,32 @@ def extract_citations(risk_analysis: str) -> str:
     """Extract citations from political risk analysis."""
     try:
         citations = []
-        
-        table_pattern = r"\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|\s*(\d+)\s*\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|\s*([^|]+)\s*\|"
-        matches = re.findall(table_pattern, risk_analysis)
-        
-        for match in matches:
-            if len(match) >= 9:
-                country = match[0].strip()
-                political_type = match[1].strip()
-                risk_info = match[2].strip()
-                pub_date = match[5].strip()
-                citation_title = match[6].strip()
-                source_name = match[7].strip()
-                url = match[8].strip()
-                
-                if country.lower() == "country" and "political type" in political_type.lower():
-                    continue
-                
-                citation = {
-                    "title": citation_title,
-                    "source": source_name,
-                    "url": url,
-                    "publication_date": pub_date,
-                    "country": country,
-                    "risk_type": political_type,
-                    "risk_info": risk_info
-                }
-                
-                if not any(c.get("url") == url and c.get("title") == citation_title for c in citations):
-                    citations.append(citation)
-        
-        return json.dumps({
+        seen = set()  # (url, title) pairs already added
+        
+        for (country, political_type, risk_info, _, _,
+             pub_date, citation_title, source_name, url) in _iter_table_rows(risk_analysis):
+            key = (url, citation_title)
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            citations.append({
+                "title": citation_title,
+                "source": source_name,
+                "url": url,
+                "publication_date": pub_date,
+                "country": country,
+                "risk_type": political_type,
+                "risk_info": risk_info
+            })
+        
+        return _dumps({
             "citations": citations,
             "count": len(citations),
             "timestamp": datetime.now().isoformat()
-        }, indent=2)
+        }, pretty=True)
         
     except Exception as e:
         print(f"Error extracting citations: {e}")
-        return json.dumps({"error": str(e), "citations": [], "count": 0})
+        return _dumps({"error": str(e), "citations": [], "count": 0})
 
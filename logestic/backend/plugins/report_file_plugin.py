@@ -9,6 +9,7 @@ import traceback
 import time
 import tempfile
 import smtplib
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
@@ -166,29 +167,37 @@ class ReportFilePlugin:
                 blob_url = f"file://{os.path.abspath(docx_filepath)}"
                 print(f"Using local file URL as fallback: {blob_url}")
             
-            # Log to database with detailed error handling
-            try:
+            # The database log and the email don't depend on each other, so the
+            # insert runs in a worker thread while the email is being sent
+            with ThreadPoolExecutor(max_workers=1) as executor:
                 print(f"Logging report to database...")
-                self._log_report_to_database(session_id, conversation_id, docx_filename, blob_url)
-                print("Successfully logged report to database")
-            except Exception as db_error:
-                print(f"Error logging report to database: {db_error}")
-                traceback.print_exc()
-                # Continue anyway
+                db_log = executor.submit(
+                    self._log_report_to_database, session_id, conversation_id, docx_filename, blob_url
+                )
+                
+                # Send email if recipient is provided
+                email_sent = False
+                if recipient_email:
+                    try:
+                        email_sent = self._send_report_email(
+                            recipient_email, docx_filepath, docx_filename, report_title
+                        )
+                    except Exception as email_error:
+                        print(f"Error sending email: {email_error}")
+                        traceback.print_exc()
+                
+                # Log to database with detailed error handling
+                try:
+                    db_log.result()
+                    print("Successfully logged report to database")
+                except Exception as db_error:
+                    print(f"Error logging report to database: {db_error}")
+                    traceback.print_exc()
+                    # Continue anyway
             
             # Return success information
             print(f"==== REPORT GENERATION COMPLETED SUCCESSFULLY ====\n")
             
-            # Send email if recipient is provided
-            email_sent = False
-            if recipient_email:
-                try:
-                    email_sent = self._send_report_email(
-                        recipient_email, docx_filepath, docx_filename, report_title
-                    )
-                except Exception as email_error:
-                    print(f"Error sending email: {email_error}")
-                    traceback.print_exc()
             return json.dumps({
                 "success": True,
                 "filename": docx_filename,
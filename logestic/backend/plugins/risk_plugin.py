@@ -1,8 +1,17 @@
 """Risk calculation plugin for schedule risk assessment."""
 
 import json
+from bisect import bisect_right
 from langchain_core.tools import tool
 
+# Upper bounds (exclusive) of the Low and Medium risk bands, and the
+# pre-serialized result for each band
+_RISK_THRESHOLDS = (5, 15)
+_RISK_CATEGORIES = tuple(
+    json.dumps({"risk_flag": flag, "risk_points": points})
+    for flag, points in (("Low Risk", 1), ("Medium Risk", 3), ("High Risk", 5))
+)
+
 @tool
 def calculate_risk_percentage(days_variance: int, days_until_due: int) -> str:
     """Calculates risk percentage based on days variance and time until due date"""
@@ -19,20 +28,6 @@ def calculate_risk_percentage(days_variance: int, days_until_due: int) -> str:
 def categorize_risk(risk_percentage: float) -> str:
     """Categorizes risk based on percentage and returns risk flag and points"""
     try:
-        if risk_percentage < 5:
-            return json.dumps({
-                "risk_flag": "Low Risk",
-                "risk_points": 1
-            })
-        elif risk_percentage < 15:
-            return json.dumps({
-                "risk_flag": "Medium Risk",
-                "risk_points": 3
-            })
-        else:
-            return json.dumps({
-                "risk_flag": "High Risk",
-                "risk_points": 5
-            })
+        return _RISK_CATEGORIES[bisect_right(_RISK_THRESHOLDS, risk_percentage)]
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return json.dumps({"error": str(e)})
\ No newline at end of file
@@ -1,23 +1,57 @@
 """Equipment schedule plugin for schedule management."""
 
-import json
-from langchain_core.tools import tool
-from utils.database_utils import execute_rpc_with_retry
+import os
+import orjson
+from langchain_core.tools import StructuredTool
+from utils.database_utils import execute_rpc_with_retry, execute_rpc_with_retry_async
 
-@tool
-def get_schedule_comparison_data() -> str:
+# The comparison data is read-only, so repeated tool calls within this window reuse it
+SCHEDULE_CACHE_TTL_SECONDS = float(os.getenv("SCHEDULE_CACHE_TTL_SECONDS", "30"))
+
+
+def _format_schedule_results(results) -> str:
+    """Serializes the RPC rows returned for the schedule comparison."""
+    print(f"RPC returned {len(results) if results else 0} rows")
+    
+    # Supabase rows are already JSON-shaped; default=str only covers stray types like Decimal
+    return orjson.dumps(results or [], default=str).decode()
+
+
+def _get_schedule_comparison_data() -> str:
     """Retrieves equipment schedule comparison data for analysis"""
     try:
         print("Called get_schedule_comparison_data (LangChain Tool)")
         
         # Call the Supabase Postgres RPC function
-        results = execute_rpc_with_retry('get_schedule_comparison_data')
+        results = execute_rpc_with_retry(
+            'get_schedule_comparison_data', cache_ttl=SCHEDULE_CACHE_TTL_SECONDS
+        )
+        return _format_schedule_results(results)
         
-        print(f"RPC returned {len(results) if results else 0} rows")
+    except Exception as e:
+        print(f"Error in get_schedule_comparison_data: {str(e)}")
+        return orjson.dumps({"error": str(e)}).decode()
+
+
+async def _aget_schedule_comparison_data() -> str:
+    """Retrieves equipment schedule comparison data for analysis"""
+    try:
+        print("Called get_schedule_comparison_data (LangChain Tool, async)")
         
-        # Return as JSON string
-        return json.dumps(results, default=str) if results else "[]"
+        # Same RPC, awaited so the agent graph's event loop keeps running
+        results = await execute_rpc_with_retry_async(
+            'get_schedule_comparison_data', cache_ttl=SCHEDULE_CACHE_TTL_SECONDS
+        )
+        return _format_schedule_results(results)
         
     except Exception as e:
         print(f"Error in get_schedule_comparison_data: {str(e)}")
-        return json.dumps({"error": str(e)})
\ No newline at end of file
+        return orjson.dumps({"error": str(e)}).decode()
+
+
+# Tool nodes await the coroutine; plain .invoke() callers get the sync version
+get_schedule_comparison_data = StructuredTool.from_function(
+    func=_get_schedule_comparison_data,
+    coroutine=_aget_schedule_comparison_data,
+    name="get_schedule_comparison_data",
+)
@@ -0,0 +1,80 @@
+"""Cached DuckDuckGo search tool shared by the risk agents."""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_community.tools import DuckDuckGoSearchResults
+
+# Search results are cached process-wide so repeated queries from different
+# sessions and agents do not hit DuckDuckGo (and its rate limits) again.
+_SEARCH_CACHE_MAXSIZE = int(os.getenv("SEARCH_CACHE_MAXSIZE", "1024"))
+_SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600"))
+
+_search_cache = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+
+def _cache_key(query: str) -> str:
+    """Builds the cache key for a search query."""
+    return hashlib.blake2b(query.strip().lower().encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _cache_get(key: str):
+    """Returns a cached result, or None if it is missing or expired."""
+    with _search_cache_lock:
+        entry = _search_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del _search_cache[key]
+            return None
+        _search_cache.move_to_end(key)
+        return result
+
+
+def _cache_set(key: str, result) -> None:
+    """Stores a result, evicting the least recently used entries when full."""
+    with _search_cache_lock:
+        _search_cache[key] = (time.monotonic() + _SEARCH_CACHE_TTL, result)
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > _SEARCH_CACHE_MAXSIZE:
+            _search_cache.popitem(last=False)
+
+
+def clear_search_cache() -> None:
+    """Drops all cached search results."""
+    with _search_cache_lock:
+        _search_cache.clear()
+
+
+def _has_results(result) -> bool:
+    """Tells whether a search tool result holds any hits.
+    
+    With response_format="content_and_artifact" the tool returns a
+    (content, raw_results) tuple, which is truthy even when nothing was found.
+    """
+    if isinstance(result, tuple):
+        return bool(result[1]) if len(result) > 1 else bool(result[0])
+    return bool(result)
+
+
+class CachedDuckDuckGoSearchResults(DuckDuckGoSearchResults):
+    """DuckDuckGo search tool with an in-process TTL/LRU result cache."""
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None):
+        key = _cache_key(query)
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
+        result = super()._run(query, run_manager=run_manager)
+        # Only cache real results; error strings and empty results are retried
+        if _has_results(result):
+            _cache_set(key, result)
+        return result
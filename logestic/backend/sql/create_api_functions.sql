@@ -0,0 +1,265 @@
+-- PostgreSQL functions backing the /api/sessions and /api/thinking-logs endpoints
+-- Grouping by session/conversation/agent is done here so the API receives
+-- one pre-shaped row per session instead of every raw log row.
+
+
+-- Sessions with their conversations and messages, most recent first.
+-- Paginated by session; p_since only keeps events created at or after that time.
+CREATE OR REPLACE FUNCTION get_sessions_grouped(
+    p_limit INT DEFAULT 100,
+    p_offset INT DEFAULT 0,
+    p_since TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS TABLE (
+    session_id VARCHAR(100),
+    conversations JSONB
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH session_page AS (
+        SELECT e.session_id AS sess_id
+        FROM dim_agent_event_log e
+        WHERE p_since IS NULL OR e.created_date >= p_since
+        GROUP BY e.session_id
+        ORDER BY MAX(e.created_date) DESC
+        LIMIT p_limit OFFSET p_offset
+    ),
+    conversation_data AS (
+        SELECT
+            e.session_id AS sess_id,
+            e.conversation_id AS conv_id,
+            MAX(e.event_time) AS last_interaction,
+            MAX(e.created_date) AS last_created,
+            jsonb_agg(jsonb_build_object(
+                'event_time', e.event_time,
+                'user_query', e.user_query,
+                'agent_output', e.agent_output,
+                'action', e.action
+            ) ORDER BY e.created_date DESC) AS messages
+        FROM dim_agent_event_log e
+        JOIN session_page sp ON e.session_id IS NOT DISTINCT FROM sp.sess_id
+        WHERE p_since IS NULL OR e.created_date >= p_since
+        GROUP BY e.session_id, e.conversation_id
+    )
+    SELECT
+        cd.sess_id AS session_id,
+        jsonb_agg(jsonb_build_object(
+            'conversation_id', cd.conv_id,
+            'last_interaction', cd.last_interaction,
+            'messages', cd.messages
+        ) ORDER BY cd.last_created DESC) AS conversations
+    FROM conversation_data cd
+    GROUP BY cd.sess_id
+    ORDER BY MAX(cd.last_created) DESC;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Lets the DISTINCT ON below walk each session's events in order instead of
+-- sorting every event row; user_query is read from the heap, since covering
+-- the unbounded TEXT column would fail inserts past the btree row size limit
+DROP INDEX IF EXISTS idx_agent_event_log_session_first_query;
+CREATE INDEX idx_agent_event_log_session_first_query
+    ON dim_agent_event_log (session_id, event_time)
+    WHERE user_query IS NOT NULL;
+
+
+-- One row per session with its first user query, newest session first
+CREATE OR REPLACE FUNCTION get_session_ids_with_first_query()
+RETURNS TABLE (
+    session_id VARCHAR(100),
+    user_query TEXT,
+    session_date TIMESTAMPTZ
+) AS $$
+    SELECT s.session_id, s.user_query, s.session_date
+    FROM (
+        SELECT DISTINCT ON (e.session_id)
+            e.session_id,
+            e.user_query,
+            e.event_time AS session_date
+        FROM dim_agent_event_log e
+        WHERE e.user_query IS NOT NULL
+        ORDER BY e.session_id, e.event_time ASC
+    ) s
+    ORDER BY s.session_date DESC;
+$$ LANGUAGE sql STABLE;
+
+
+-- Thinking logs grouped by session -> conversation -> agent for a page of the latest rows.
+-- thought_content and thinking_stage_output are left out of this list view;
+-- get_thinking_log_by_session returns them for the drill-down.
+CREATE OR REPLACE FUNCTION get_thinking_logs_grouped(
+    row_limit INT DEFAULT 500,
+    row_offset INT DEFAULT 0,
+    p_since TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS TABLE (
+    session_id VARCHAR(100),
+    conversations JSONB
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH recent_rows AS (
+        SELECT
+            t.session_id,
+            t.conversation_id,
+            t.agent_name,
+            t.thinking_stage,
+            t.user_query,
+            t.created_date
+        FROM dim_agent_thinking_log t
+        WHERE t.session_id IS NOT NULL
+          AND (p_since IS NULL OR t.created_date >= p_since)
+        ORDER BY t.created_date DESC
+        LIMIT row_limit OFFSET row_offset
+    ),
+    agent_data AS (
+        SELECT
+            r.session_id AS sess_id,
+            r.conversation_id AS conv_id,
+            r.agent_name,
+            MAX(r.created_date) AS first_appearance,
+            jsonb_agg(jsonb_build_object(
+                'thinking_stage', r.thinking_stage,
+                'created_date', r.created_date
+            ) ORDER BY r.created_date DESC) AS thoughts
+        FROM recent_rows r
+        GROUP BY r.session_id, r.conversation_id, r.agent_name
+    ),
+    conversation_data AS (
+        SELECT
+            ad.sess_id,
+            ad.conv_id,
+            MAX(ad.first_appearance) AS last_created,
+            (
+                SELECT r.user_query
+                FROM recent_rows r
+                WHERE r.session_id = ad.sess_id
+                  AND r.conversation_id = ad.conv_id
+                  AND r.user_query IS NOT NULL
+                ORDER BY r.created_date DESC
+                LIMIT 1
+            ) AS user_query,
+            jsonb_agg(jsonb_build_object(
+                'agent_name', ad.agent_name,
+                'first_appearance', ad.first_appearance,
+                'thoughts', ad.thoughts
+            ) ORDER BY ad.first_appearance DESC) AS agents
+        FROM agent_data ad
+        GROUP BY ad.sess_id, ad.conv_id
+    )
+    SELECT
+        cd.sess_id AS session_id,
+        jsonb_agg(jsonb_build_object(
+            'conversation_id', cd.conv_id,
+            'user_query', cd.user_query,
+            'agents', cd.agents
+        ) ORDER BY cd.last_created DESC) AS conversations
+    FROM conversation_data cd
+    GROUP BY cd.sess_id
+    ORDER BY MAX(cd.last_created) DESC;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- One row per session that has thinking logs, with its most recent user query
+CREATE OR REPLACE FUNCTION get_thinking_log_ids()
+RETURNS TABLE (
+    session_id VARCHAR(100),
+    first_query TEXT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT s.session_id, s.first_query
+    FROM (
+        SELECT DISTINCT ON (t.session_id)
+            t.session_id,
+            t.user_query AS first_query,
+            t.created_date
+        FROM dim_agent_thinking_log t
+        WHERE t.user_query IS NOT NULL
+          AND t.session_id IS NOT NULL
+        ORDER BY t.session_id, t.created_date DESC
+    ) s
+    ORDER BY s.created_date DESC;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Conversations (grouped by agent) for a single session, oldest first
+CREATE OR REPLACE FUNCTION get_thinking_log_by_session(p_session_id TEXT)
+RETURNS JSONB AS $$
+    WITH agent_data AS (
+        SELECT
+            t.conversation_id AS conv_id,
+            t.agent_name,
+            MIN(t.created_date) AS first_appearance,
+            jsonb_agg(jsonb_build_object(
+                'thought_content', t.thought_content,
+                'thinking_stage', t.thinking_stage,
+                'thinking_stage_output', t.thinking_stage_output,
+                'created_date', t.created_date
+            ) ORDER BY t.created_date ASC) AS thoughts
+        FROM dim_agent_thinking_log t
+        WHERE t.session_id = p_session_id
+        GROUP BY t.conversation_id, t.agent_name
+    ),
+    conversation_data AS (
+        SELECT
+            ad.conv_id,
+            MIN(ad.first_appearance) AS first_created,
+            (
+                SELECT t.user_query
+                FROM dim_agent_thinking_log t
+                WHERE t.session_id = p_session_id
+                  AND t.conversation_id = ad.conv_id
+                  AND t.user_query IS NOT NULL
+                ORDER BY t.created_date ASC
+                LIMIT 1
+            ) AS user_query,
+            jsonb_agg(jsonb_build_object(
+                'agent_name', ad.agent_name,
+                'first_appearance', ad.first_appearance,
+                'thoughts', ad.thoughts
+            ) ORDER BY ad.first_appearance ASC) AS agents
+        FROM agent_data ad
+        GROUP BY ad.conv_id
+    )
+    SELECT COALESCE(
+        jsonb_agg(jsonb_build_object(
+            'conversation_id', cd.conv_id,
+            'user_query', cd.user_query,
+            'agents', cd.agents
+        ) ORDER BY cd.first_created ASC),
+        '[]'::jsonb
+    )
+    FROM conversation_data cd;
+$$ LANGUAGE sql STABLE;
+
+
+-- Conversations and messages for a single session, oldest first; NULL if the session has no events
+CREATE OR REPLACE FUNCTION get_session_by_id(p_session_id TEXT)
+RETURNS JSONB AS $$
+    WITH conversation_data AS (
+        SELECT
+            e.conversation_id AS conv_id,
+            MIN(e.event_time) AS first_event,
+            MAX(e.event_time) AS last_interaction,
+            jsonb_agg(jsonb_build_object(
+                'event_time', e.event_time,
+                'user_query', e.user_query,
+                'agent_output', e.agent_output,
+                'agent_name', e.agent_name,
+                'action', e.action
+            ) ORDER BY e.event_time ASC) AS messages
+        FROM dim_agent_event_log e
+        WHERE e.session_id = p_session_id
+        GROUP BY e.conversation_id
+    )
+    SELECT jsonb_agg(jsonb_build_object(
+        'conversation_id', cd.conv_id,
+        'last_interaction', cd.last_interaction,
+        'messages', cd.messages
+    ) ORDER BY cd.first_event ASC)
+    FROM conversation_data cd;
+$$ LANGUAGE sql STABLE;
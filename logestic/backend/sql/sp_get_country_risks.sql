@@ -1,6 +1,10 @@
 -- PostgreSQL function for Country Risk Heatmap Data
 -- Replaces the MS SQL stored procedure [dbo].[GetCountryRiskHeatmapData]
 
+-- breakdown is returned pre-serialized as TEXT so the API can pass it straight through;
+-- changing the return type requires dropping the old JSONB version first
+DROP FUNCTION IF EXISTS get_country_risk_heatmap_data(TEXT, TEXT);
+
 CREATE OR REPLACE FUNCTION get_country_risk_heatmap_data(
     p_conversation_id TEXT DEFAULT NULL,
     p_session_id TEXT DEFAULT NULL
@@ -11,7 +15,7 @@ RETURNS TABLE (
     session_id TEXT,
     country TEXT,
     average_risk NUMERIC,
-    breakdown JSONB
+    breakdown TEXT
 ) AS $$
 BEGIN
     RETURN QUERY
@@ -78,7 +82,29 @@ BEGIN
         cd.sess_id AS session_id,
         cd.country_name AS country,
         cd.avg_risk AS average_risk,
-        cd.breakdown_json AS breakdown
+        COALESCE(cd.breakdown_json::TEXT, '') AS breakdown
     FROM country_data cd;
 END;
 $$ LANGUAGE plpgsql;
+
+
+-- The same rows as one JSONB array shaped like the API's HeatmapResponse,
+-- so /api/heatmap can return it without re-building each row in Python
+CREATE OR REPLACE FUNCTION get_country_risk_heatmap_json(
+    p_conversation_id TEXT DEFAULT NULL,
+    p_session_id TEXT DEFAULT NULL
+)
+RETURNS JSONB AS $$
+    SELECT COALESCE(
+        jsonb_agg(jsonb_build_object(
+            'datetime_stamp', h.datetime_stamp,
+            'conversation_id', COALESCE(h.conversation_id, ''),
+            'session_id', COALESCE(h.session_id, ''),
+            'country', COALESCE(h.country, ''),
+            'average_risk', COALESCE(h.average_risk, 0)::INT::TEXT,
+            'breakdown', COALESCE(h.breakdown, '')
+        )),
+        '[]'::jsonb
+    )
+    FROM get_country_risk_heatmap_data(p_conversation_id, p_session_id) h;
+$$ LANGUAGE sql STABLE;
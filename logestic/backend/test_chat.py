@@ -1,22 +1,44 @@
-import json
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
-
-req = Request(
-    'http://127.0.0.1:8000/api/chat',
-    data=json.dumps({'message': 'hello'}).encode(),
-    headers={'Content-Type': 'application/json'}
-)
-try:
-    r = urlopen(req, timeout=60)
-    with open('test_output.txt', 'w', encoding='utf-8') as f:
-        f.write("SUCCESS:\n" + r.read().decode())
-except HTTPError as e:
-    with open('test_output.txt', 'w', encoding='utf-8') as f:
-        f.write(f"HTTP {e.code}\n" + e.read().decode())
-except Exception as ex:
-    import traceback
-    with open('test_output.txt', 'w', encoding='utf-8') as f:
-        f.write(f"Exception: {ex}\n")
-        traceback.print_exc(file=f)
-print("Done - check test_output.txt")
+"""Manual smoke test for the chat API; run it while api_server is up."""
+
+import asyncio
+import traceback
+
+import httpx
+
+API_URL = 'http://127.0.0.1:8000/api/chat'
+
+# (message, output file) pairs, sent concurrently over one keep-alive client
+PAYLOADS = [
+    ('hello', 'test_output.txt'),
+    ('generate a report of all schedule risks', 'test_report_output.txt'),
+]
+
+
+async def send_message(client: httpx.AsyncClient, message: str, output_file: str):
+    try:
+        r = await client.post(API_URL, json={'message': message})
+        if r.is_success:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write("SUCCESS:\n" + r.text)
+            print(f"SUCCESS ({message!r})")
+            print(f"Response: {r.json().get('response', '')[:500]}")
+        else:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(f"HTTP {r.status_code}\n" + r.text)
+            print(f"HTTP ERROR {r.status_code} ({message!r}): {r.text[:500]}")
+    except Exception as ex:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(f"Exception: {ex}\n")
+            traceback.print_exc(file=f)
+        print(f"Exception ({message!r}): {ex}")
+
+
+async def main():
+    async with httpx.AsyncClient(timeout=120) as client:
+        await asyncio.gather(*(send_message(client, message, output_file)
+                               for message, output_file in PAYLOADS))
+    print("Done - check " + ", ".join(output_file for _, output_file in PAYLOADS))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+"""Checks that the cached DuckDuckGo tool only caches searches with hits.
+
+Run from the backend directory: python -m pytest test_scripts/test_search_cache.py
+"""
+
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+
+from plugins.search_plugin import CachedDuckDuckGoSearchResults, clear_search_cache
+
+HIT = {"snippet": "Port strike ends", "title": "Strike news", "link": "https://example.com/strike"}
+
+
+def _run_twice(raw_results):
+    clear_search_cache()
+    tool = CachedDuckDuckGoSearchResults()
+    with mock.patch.object(DuckDuckGoSearchAPIWrapper, "results", return_value=raw_results) as backend:
+        tool._run("port strike")
+        tool._run("port strike")
+    return backend.call_count
+
+
+def test_empty_results_are_not_cached():
+    assert _run_twice([]) == 2
+
+
+def test_results_are_cached():
+    assert _run_twice([HIT]) == 1
+
+
+if __name__ == "__main__":
+    test_empty_results_are_not_cached()
+    test_results_are_cached()
+    print("Search cache tests passed")
@@ -1,8 +1,27 @@
+import time
+import random
+import asyncio
+import functools
 import threading
+from collections import OrderedDict
 from config.settings import get_supabase_client
 
-_client_instance = None
-_client_lock = threading.Lock()
+# Short-lived results of read-only RPCs, for callers that opt in with cache_ttl
+_RPC_CACHE_MAXSIZE = 128
+_rpc_cache = OrderedDict()
+_rpc_cache_lock = threading.Lock()
+_CACHE_MISS = object()
+
+@functools.cache
+def _build_client():
+    """Creates the Supabase client once; later calls return the cached client."""
+    try:
+        client = get_supabase_client()
+        print("Created new Supabase client")
+        return client
+    except Exception as e:
+        print(f"Error connecting to Supabase: {e}")
+        raise
 
 def get_connection():
     """Gets a singleton Supabase client.
@@ -10,42 +29,90 @@ def get_connection():
     Returns:
         Client: The Supabase client connection
     """
-    global _client_instance
-    if _client_instance is None:
-        with _client_lock:
-            if _client_instance is None:
-                try:
-                    _client_instance = get_supabase_client()
-                    print("Created new Supabase client")
-                except Exception as e:
-                    print(f"Error connecting to Supabase: {e}")
-                    raise
+    return _build_client()
+
+def _retry_delay(attempt: int) -> float:
+    """Seconds to wait before retry number attempt, with exponential backoff and jitter.
     
-    return _client_instance
+    The jitter keeps concurrent callers from retrying in lockstep after a 429.
+    """
+    return min(8.0, 0.25 * 2 ** attempt) + random.random() * 0.25
+
+def _rpc_cache_key(rpc_name: str, params=None):
+    """Builds the cache key for an RPC call, or None if params aren't hashable."""
+    try:
+        key = (rpc_name, frozenset(params.items()) if params else None)
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def _rpc_cache_get(key):
+    """Returns a cached RPC result, or _CACHE_MISS if it is missing or expired."""
+    with _rpc_cache_lock:
+        entry = _rpc_cache.get(key)
+        if entry is None:
+            return _CACHE_MISS
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del _rpc_cache[key]
+            return _CACHE_MISS
+        _rpc_cache.move_to_end(key)
+        return data
+
+def _rpc_cache_set(key, data, ttl: float):
+    """Stores an RPC result for ttl seconds, evicting the least recently used entries."""
+    with _rpc_cache_lock:
+        _rpc_cache[key] = (time.monotonic() + ttl, data)
+        _rpc_cache.move_to_end(key)
+        while len(_rpc_cache) > _RPC_CACHE_MAXSIZE:
+            _rpc_cache.popitem(last=False)
+
+def clear_rpc_cache():
+    """Drops all cached RPC results."""
+    with _rpc_cache_lock:
+        _rpc_cache.clear()
 
-def execute_rpc_with_retry(rpc_name: str, params=None, max_retries=3):
+def _run_rpc(rpc_name: str, params=None):
+    """Runs a single Supabase RPC call and returns its data."""
+    client = get_connection()
+    if params:
+        return client.rpc(rpc_name, params).execute().data
+    return client.rpc(rpc_name).execute().data
+
+def _run_insert(table_name: str, data):
+    """Runs a single Supabase insert and returns its data."""
+    client = get_connection()
+    return client.table(table_name).insert(data).execute().data
+
+def execute_rpc_with_retry(rpc_name: str, params=None, max_retries=3, cache_ttl=None):
     """Executes a Supabase RPC data fetch with retry logic.
     
     Args:
         rpc_name: The Postgres function name
         params: Query parameters (dict)
         max_retries: Maximum number of retry attempts
+        cache_ttl: Seconds to reuse the result of a read-only RPC; None disables caching.
+            Cached results are shared between callers and must not be mutated.
         
     Returns:
         The query results data list
     """
+    cache_key = _rpc_cache_key(rpc_name, params) if cache_ttl else None
+    if cache_key is not None:
+        cached = _rpc_cache_get(cache_key)
+        if cached is not _CACHE_MISS:
+            return cached
+    
     retry_count = 0
     last_error = None
     
     while retry_count < max_retries:
         try:
-            client = get_connection()
-            if params:
-                response = client.rpc(rpc_name, params).execute()
-            else:
-                response = client.rpc(rpc_name).execute()
-                
-            return response.data
+            data = _run_rpc(rpc_name, params)
+            if cache_key is not None:
+                _rpc_cache_set(cache_key, data, cache_ttl)
+            return data
             
         except Exception as e:
             retry_count += 1
@@ -53,8 +120,7 @@ def execute_rpc_with_retry(rpc_name: str, params=None, max_retries=3):
             print(f"Supabase RPC query failed (attempt {retry_count}/{max_retries}): {e}")
             
             if retry_count < max_retries:
-                import time
-                time.sleep(0.5)
+                time.sleep(_retry_delay(retry_count))
             else:
                 print(f"Failed to execute RPC after {max_retries} attempts")
                 raise last_error
@@ -64,7 +130,7 @@ def insert_table_with_retry(table_name: str, data: dict, max_retries=3):
     
     Args:
         table_name: Name of table
-        data: Dict of columns/values
+        data: Dict of columns/values, or a list of dicts for a bulk insert
         max_retries: Maximum number of retry attempts
         
     Returns:
@@ -75,9 +141,7 @@ def insert_table_with_retry(table_name: str, data: dict, max_retries=3):
     
     while retry_count < max_retries:
         try:
-            client = get_connection()
-            response = client.table(table_name).insert(data).execute()
-            return response.data
+            return _run_insert(table_name, data)
             
         except Exception as e:
             retry_count += 1
@@ -85,8 +149,40 @@ def insert_table_with_retry(table_name: str, data: dict, max_retries=3):
             print(f"Supabase Insert failed (attempt {retry_count}/{max_retries}): {e}")
             
             if retry_count < max_retries:
-                import time
-                time.sleep(0.5)
+                time.sleep(_retry_delay(retry_count))
             else:
                 print(f"Failed to execute Insert after {max_retries} attempts")
-                raise last_error
\ No newline at end of file
+                raise last_error
+
+async def execute_rpc_with_retry_async(rpc_name: str, params=None, max_retries=3, cache_ttl=None):
+    """Async version of execute_rpc_with_retry that keeps the event loop free.
+    
+    Each attempt runs the blocking Supabase call in a worker thread.
+    
+    Args:
+        rpc_name: The Postgres function name
+        params: Query parameters (dict)
+        max_retries: Maximum number of retry attempts
+        cache_ttl: Seconds to reuse the result of a read-only RPC; None disables caching
+        
+    Returns:
+        The query results data list
+    """
+    cache_key = _rpc_cache_key(rpc_name, params) if cache_ttl else None
+    if cache_key is not None:
+        cached = _rpc_cache_get(cache_key)
+        if cached is not _CACHE_MISS:
+            return cached
+    
+    for attempt in range(1, max_retries + 1):
+        try:
+            data = await asyncio.to_thread(_run_rpc, rpc_name, params)
+            if cache_key is not None:
+                _rpc_cache_set(cache_key, data, cache_ttl)
+            return data
+        except Exception as e:
+            print(f"Supabase RPC query failed (attempt {attempt}/{max_retries}): {e}")
+            if attempt == max_retries:
+                print(f"Failed to execute RPC after {max_retries} attempts")
+                raise
+            await asyncio.sleep(_retry_delay(attempt))